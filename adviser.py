@@ -133,14 +133,19 @@
 #         return f"### Error Parsing Gemini Response\n\nReceived an unexpected response from the API: {result}"
 
 import pandas as pd
-import google.generativeai as genai  # <-- Import the new library
+from llm_gateway import gemini_model, request_key, key_fingerprint, QUOTA_ERRORS
+from model_router import routed_call, MODEL_TIERS
+from risk_simulator import exceeds_tolerance
 # import requests  <-- No longer needed
 # import json      <-- No longer needed
 
-def generate_advice(hist_df, sentiment_score, risk_tolerance):
+def generate_advice(hist_df, sentiment_score, risk_tolerance, risk_profile=None):
     """
     Generates a simple 'Buy', 'Sell', or 'Hold' recommendation based on technical and sentiment signals.
     This function provides the high-level tag for the recommendation card.
+
+    When a simulated risk profile is given, buy signals are checked against the
+    drawdown and loss-probability limits of the user's risk tolerance.
     """
     if hist_df is None or 'SMA_50' not in hist_df.columns or 'SMA_200' not in hist_df.columns or len(hist_df) < 2:
         return "Insufficient Data", "Could not generate advice due to lack of historical data.", "hold"
@@ -178,13 +183,28 @@ def generate_advice(hist_df, sentiment_score, risk_tolerance):
         style_class = "sell"
 
     # Adjusting for risk tolerance
-    if risk_tolerance == "Low" and (advice == "Strong Buy" or advice == "Buy"):
-        advice = "Consider Buying"
-    if risk_tolerance == "High" and advice == "Hold" and technical_signal > 0:
-        advice = "Speculative Buy"
+    if risk_profile is None:
+        if risk_tolerance == "Low" and (advice == "Strong Buy" or advice == "Buy"):
+            advice = "Consider Buying"
+        if risk_tolerance == "High" and advice == "Hold" and technical_signal > 0:
+            advice = "Speculative Buy"
+    else:
+        too_risky = exceeds_tolerance(risk_profile, risk_tolerance)
+        # A buy signal on a stock riskier than the investor accepts is stepped down one level
+        if too_risky and advice == "Strong Buy":
+            advice = "Buy"
+        elif too_risky and advice == "Buy":
+            advice = "Hold"
+            style_class = "hold"
+        elif not too_risky and risk_tolerance == "High" and advice == "Hold" and technical_signal > 0:
+            advice = "Speculative Buy"
+            style_class = "buy"
 
     # We will let Gemini generate the detailed explanation
     explanation = f"Generated based on technical indicators and a sentiment score of {sentiment_score:.2f}."
+    if risk_profile is not None:
+        explanation += (f" Simulated {risk_profile['horizon_days']}-day risk: {risk_profile['severe_loss_probability']:.0%} chance of losing over 10%,"
+                        f" 95th percentile drawdown of {risk_profile['drawdown_95']:.0%}.")
 
     return advice, explanation, style_class
 
@@ -207,9 +227,6 @@ def generate_gemini_report(stock_info, tech_indicators, sentiment, risk, api_key
         return "### Gemini API Key Not Provided\n\nPlease enter your Google Gemini API key in the sidebar to generate a detailed report."
 
     try:
-        # --- Configure the Gemini API key ---
-        genai.configure(api_key=api_key)
-
         # --- Prepare data for the prompt ---
         latest_price = tech_indicators['Close'].iloc[-1]
         latest_sma_50 = tech_indicators['SMA_50'].iloc[-1]
@@ -242,13 +259,7 @@ Structure the report with the following Markdown sections:
 - `### Final Recommendation` (Provide a concluding paragraph with a clear course of action).
 """
 
-        # --- 2. Initialize the Model (as per your last request) ---
-        model = genai.GenerativeModel(
-            model_name='gemini-2.5-pro',  # Using 1.5-pro as a robust standard
-            system_instruction=system_instruction
-        )
-
-        # --- 3. Define the User Prompt (The specific data) ---
+        # --- 2. Define the User Prompt (The specific data) ---
         user_prompt = f"""
 Generate a comprehensive investment report for {company_name} ({stock_info.get('symbol', '')}).
 The target audience is an investor with a **{risk}** risk tolerance.
@@ -263,11 +274,25 @@ The target audience is an investor with a **{risk}** risk tolerance.
 - **Recent News Sentiment:** {sentiment_situation} (Score: {sentiment:.2f})
 """
 
-        # --- 4. Call the API ---
-        response = model.generate_content(user_prompt)
-        
-        return response.text
-
+        # --- 3. Call the API on the pro tier, falling back to the fast tier or the last report ---
+        def build(model_name, timeout):
+            model = gemini_model(api_key, model_name, system_instruction)
+            # Identical concurrent reports share one rate-limited call
+            key = request_key('report', model_name, system_instruction, user_prompt, key_fingerprint(api_key))
+            return key, lambda: model.generate_content(user_prompt, request_options={'timeout': timeout}).text
+
+        cache_key = request_key('last-report', stock_info.get('symbol', ''), risk, key_fingerprint(api_key))
+        report, served_by = routed_call('report', build, cache_key=cache_key)
+        if served_by == 'cache':
+            report += "\n\n---\n*The Gemini models did not answer in time, so this is the most recent earlier report for this stock.*"
+        elif served_by != MODEL_TIERS['pro']:
+            report += f"\n\n---\n*Generated by {served_by} because the detailed model was too slow or busy.*"
+        return report
+
+    except TimeoutError as e:
+        return f"### Gemini Report Timed Out\n\n{e}.\nPlease try again in a moment."
+    except QUOTA_ERRORS as e:
+        return f"### Gemini Quota Exceeded\n\nThe Gemini API is still rate limiting requests after several retries: {e}\nPlease wait a minute and try again."
     except Exception as e:
         # Catch-all for API errors, auth errors, etc.
         return f"### Error Generating Gemini Report\n\nAn error occurred: {e}\nPlease check your API key, network connection, and model name."
\ No newline at end of file
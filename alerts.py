@@ -0,0 +1,389 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import streamlit as st
+from peewee import (
+    SqliteDatabase, Model, CharField, TextField, FloatField, BooleanField,
+    DateTimeField, DateField, AutoField
+)
+
+from data_fetcher import download_price_history
+from news_store import DailySentiment, init_news_store, ingest_news
+from storage import open_database
+
+logger = logging.getLogger(__name__)
+
+db = SqliteDatabase(None)
+
+# Server-side NewsAPI key the evaluator ingests watched tickers' news with
+NEWSAPI_KEY = os.environ.get("NEWSAPI_KEY")
+NEWS_INGEST_INTERVAL = int(os.environ.get("ALERT_NEWS_INTERVAL_SECONDS", "3600"))  # NewsAPI quotas are per day
+
+RULE_TYPES = {
+    'golden_cross': "Golden Cross (SMA 50 crosses above SMA 200)",
+    'death_cross': "Death Cross (SMA 50 crosses below SMA 200)",
+    'rsi_overbought': "RSI crosses above 70",
+    'rsi_oversold': "RSI crosses below 30",
+    'sentiment_swing': "Daily news sentiment swings by 0.5 or more",
+}
+DEFAULT_THRESHOLDS = {'rsi_overbought': 70.0, 'rsi_oversold': 30.0, 'sentiment_swing': 0.5}
+if not NEWSAPI_KEY:
+    # Without a key nothing keeps the daily sentiment series current between manual analyses
+    del RULE_TYPES['sentiment_swing']
+
+RSI_WINDOW = 14  # Matches the 'ta' library's momentum_rsi
+SMA_SHORT, SMA_LONG = 50, 200
+WARMUP_PERIOD = "2y"  # History pulled once when a ticker is first evaluated
+UPDATE_PERIOD = "5d"  # Recent bars pulled on every cycle; only unseen ones are applied
+# A ticker whose last processed bar is older than this may have bars missing from the update
+# window (5 sessions span at least this many calendar days), so its state is rebuilt instead
+UPDATE_MAX_GAP = timedelta(days=5)
+EVALUATION_INTERVAL = int(os.environ.get("ALERT_INTERVAL_SECONDS", "60"))
+LEASE_SECONDS = EVALUATION_INTERVAL * 3
+
+
+class BaseModel(Model):
+    class Meta:
+        database = db
+
+
+class WatchlistItem(BaseModel):
+    ticker = CharField(primary_key=True)
+    added_at = DateTimeField(default=datetime.utcnow)
+
+
+class AlertRule(BaseModel):
+    id = AutoField()
+    ticker = CharField(index=True)
+    rule_type = CharField()
+    threshold = FloatField(null=True)
+    enabled = BooleanField(default=True)
+
+
+class TickerState(BaseModel):
+    """Incremental indicator state per ticker, so each cycle only processes new bars and days."""
+    ticker = CharField(primary_key=True)
+    last_bar = DateField(null=True)
+    last_sentiment_day = DateField(null=True)
+    state = TextField(default='{}')
+
+
+class Alert(BaseModel):
+    id = AutoField()
+    ticker = CharField(index=True)
+    rule_type = CharField()
+    message = TextField()
+    bar_date = DateField()
+    fired_at = DateTimeField(default=datetime.utcnow, index=True)
+    seen = BooleanField(default=False)
+
+
+class EvaluatorLease(BaseModel):
+    """Elects one evaluator across all app processes on the host."""
+    name = CharField(primary_key=True)
+    owner = CharField()
+    expires_at = FloatField()
+
+
+def init_alert_store(path=None):
+    """
+    Opens the alert store, creating its tables on first use.
+
+    Args:
+        path (str): SQLite file to use. Defaults to alerts.db in the app's data directory.
+    """
+    open_database(db, "alerts.db", [WatchlistItem, AlertRule, TickerState, Alert, EvaluatorLease], path)
+
+
+# --- Watchlist management ---
+
+def get_watchlist():
+    """Returns the watched tickers and their enabled rule types as {ticker: [rule_type, ...]}."""
+    init_alert_store()
+    watchlist = {item.ticker: [] for item in WatchlistItem.select().order_by(WatchlistItem.ticker)}
+    for rule in AlertRule.select().where(AlertRule.enabled == True):
+        if rule.ticker in watchlist:
+            watchlist[rule.ticker].append(rule.rule_type)
+    return watchlist
+
+
+def set_watchlist(tickers, rule_types):
+    """
+    Replaces the watchlist with the given tickers, each watched with the given rule types.
+
+    Args:
+        tickers (list): Ticker symbols to watch.
+        rule_types (list): Keys of RULE_TYPES to enable for every ticker.
+    """
+    init_alert_store()
+    tickers = [t.strip().upper() for t in tickers if t.strip()]
+    with db.atomic():
+        WatchlistItem.delete().where(WatchlistItem.ticker.not_in(tickers)).execute()
+        AlertRule.delete().execute()
+        TickerState.delete().where(TickerState.ticker.not_in(tickers)).execute()
+        for ticker in tickers:
+            WatchlistItem.insert(ticker=ticker).on_conflict_ignore().execute()
+            for rule_type in rule_types:
+                AlertRule.create(ticker=ticker, rule_type=rule_type, threshold=DEFAULT_THRESHOLDS.get(rule_type))
+
+
+def get_recent_alerts(unseen_only=True, limit=10):
+    """Returns the most recently fired alerts, newest first."""
+    init_alert_store()
+    query = Alert.select().order_by(Alert.fired_at.desc(), Alert.id.desc()).limit(limit)
+    if unseen_only:
+        query = query.where(Alert.seen == False)
+    return list(query)
+
+
+def mark_alerts_seen():
+    """Marks every fired alert as read."""
+    init_alert_store()
+    Alert.update(seen=True).where(Alert.seen == False).execute()
+
+
+# --- Incremental indicator state ---
+
+def _new_state():
+    return {'closes': [], 'avg_gain': None, 'avg_loss': None, 'rsi_count': 0,
+            'prev_rsi': None, 'prev_sma_short': None, 'prev_sma_long': None, 'prev_sentiment': None}
+
+
+def _apply_bar(state, close):
+    """
+    Advances the SMA and RSI state by one bar and returns the crossings it produced.
+
+    The RSI uses Wilder's smoothing seeded the same way as 'ta',
+    and the crosses use the same condition as generate_advice.
+    """
+    events = []
+    closes = state['closes']
+    if not closes:
+        # 'ta' counts the first bar as a zero change, which seeds both averages
+        state['avg_gain'], state['avg_loss'] = 0.0, 0.0
+    else:
+        change = close - closes[-1]
+        alpha = 1.0 / RSI_WINDOW
+        state['avg_gain'] += alpha * (max(change, 0.0) - state['avg_gain'])
+        state['avg_loss'] += alpha * (max(-change, 0.0) - state['avg_loss'])
+    state['rsi_count'] += 1
+
+    closes.append(close)
+    del closes[:-SMA_LONG]
+
+    if state['rsi_count'] >= RSI_WINDOW:
+        avg_loss = state['avg_loss']
+        rsi = 100.0 if avg_loss == 0 else 100.0 - 100.0 / (1.0 + state['avg_gain'] / avg_loss)
+        prev_rsi = state['prev_rsi']
+        if prev_rsi is not None:
+            if prev_rsi <= DEFAULT_THRESHOLDS['rsi_overbought'] < rsi:
+                events.append(('rsi_overbought', rsi))
+            if prev_rsi >= DEFAULT_THRESHOLDS['rsi_oversold'] > rsi:
+                events.append(('rsi_oversold', rsi))
+        state['prev_rsi'] = rsi
+
+    if len(closes) >= SMA_LONG:
+        sma_short = sum(closes[-SMA_SHORT:]) / SMA_SHORT
+        sma_long = sum(closes) / SMA_LONG
+        prev_short, prev_long = state['prev_sma_short'], state['prev_sma_long']
+        if prev_short is not None:
+            if sma_short > sma_long and prev_short <= prev_long:
+                events.append(('golden_cross', sma_short))
+            elif sma_short < sma_long and prev_short >= prev_long:
+                events.append(('death_cross', sma_short))
+        state['prev_sma_short'], state['prev_sma_long'] = sma_short, sma_long
+    return events
+
+
+def _rule_matches(rule, event_type, value):
+    if rule.rule_type != event_type:
+        return False
+    if event_type == 'rsi_overbought':
+        return value > (rule.threshold or DEFAULT_THRESHOLDS['rsi_overbought'])
+    if event_type == 'rsi_oversold':
+        return value < (rule.threshold or DEFAULT_THRESHOLDS['rsi_oversold'])
+    return True
+
+
+def _describe(ticker, event_type, value):
+    if event_type == 'golden_cross':
+        return f"Golden cross: SMA 50 moved above SMA 200 (SMA 50 ${value:.2f})."
+    if event_type == 'death_cross':
+        return f"Death cross: SMA 50 moved below SMA 200 (SMA 50 ${value:.2f})."
+    if event_type == 'rsi_overbought':
+        return f"RSI crossed into overbought territory ({value:.1f})."
+    if event_type == 'rsi_oversold':
+        return f"RSI crossed into oversold territory ({value:.1f})."
+    return f"Daily news sentiment swung by {value:+.2f}."
+
+
+# --- Evaluation ---
+
+_news_ingested_at = {}
+
+
+def _ingest_watched_news(tickers):
+    # Brings the daily sentiment series up to date, at most once per NEWS_INGEST_INTERVAL per ticker
+    now = time.monotonic()
+    for ticker in tickers:
+        if ticker in _news_ingested_at and now - _news_ingested_at[ticker] < NEWS_INGEST_INTERVAL:
+            continue
+        try:
+            ingest_news(ticker, NEWSAPI_KEY)
+        except Exception:
+            logger.warning("Could not ingest news for %s", ticker, exc_info=True)
+        _news_ingested_at[ticker] = now
+
+
+def evaluate_watchlist():
+    """
+    Runs one evaluation cycle over every watched ticker.
+
+    New tickers are warmed up from two years of history in one batched download;
+    known tickers pull only the last few days, and only bars after their last
+    processed bar (and sentiment days after their last processed day) are applied.
+    Tickers not evaluated for longer than the update window covers (the evaluator
+    was down) are rebuilt from the warm-up history, so no bars are skipped.
+    Tickers with a sentiment rule first ingest their new articles with NEWSAPI_KEY.
+
+    Returns:
+        int: The number of alerts fired.
+    """
+    init_alert_store()
+    init_news_store()
+    rules = defaultdict(list)
+    for rule in AlertRule.select().where((AlertRule.enabled == True) & AlertRule.rule_type.in_(list(RULE_TYPES))):
+        rules[rule.ticker].append(rule)
+    if not rules:
+        return 0
+
+    today = datetime.now(timezone.utc).date()
+    states = {row.ticker: row for row in TickerState.select().where(TickerState.ticker.in_(list(rules)))}
+    new_tickers = [t for t in rules if t not in states or states[t].last_bar is None]
+    stale_tickers = [t for t in rules if t not in new_tickers and today - states[t].last_bar > UPDATE_MAX_GAP]
+    known_tickers = [t for t in rules if t not in new_tickers and t not in stale_tickers]
+
+    prices = {}
+    for tickers, period in ((new_tickers + stale_tickers, WARMUP_PERIOD), (known_tickers, UPDATE_PERIOD)):
+        if not tickers:
+            continue
+        try:
+            frame = download_price_history(tickers, period)
+        except Exception:
+            logger.warning("Could not download %s prices for %s", period, ", ".join(tickers), exc_info=True)
+            continue
+        if frame.empty:
+            continue  # No ticker in the batch has data (all invalid, delisted or not trading yet)
+        # Completed sessions only, so a still-moving intraday bar is never recorded as processed
+        dates = frame.index.date
+        frame = frame[dates < today]
+        dates = dates[dates < today].tolist()
+        # Tickers with no data are simply absent from the frame and keep their state
+        for t in frame.columns:
+            prices[t] = (dates, frame[t].to_numpy(dtype=float).tolist())
+
+    _ingest_watched_news([t for t, ticker_rules in rules.items()
+                          if any(rule.rule_type == 'sentiment_swing' for rule in ticker_rules)])
+
+    # One query for every ticker's unprocessed sentiment days; completed days only, since
+    # today's total still changes as articles arrive
+    cursors = [states[t].last_sentiment_day for t in rules if t in states]
+    day_query = DailySentiment.select().where(
+        DailySentiment.ticker.in_(list(rules)) & (DailySentiment.day < today) & (DailySentiment.article_count > 0))
+    if cursors and None not in cursors:
+        day_query = day_query.where(DailySentiment.day > min(cursors))
+    sentiment_days = defaultdict(list)
+    for day in day_query.order_by(DailySentiment.day):
+        sentiment_days[day.ticker].append(day)
+
+    fired = []
+    updated_states = []
+    for ticker, ticker_rules in rules.items():
+        row = states.get(ticker) or TickerState(ticker=ticker)
+        state = json.loads(row.state) if row.state else None
+        state = state or _new_state()
+        # Warm-up bars only build state; alerts fire for bars after the first evaluation
+        warming_up = row.last_bar is None
+        fire_after = row.last_bar
+        replay_after = row.last_bar
+        if ticker in stale_tickers and ticker in prices:
+            # Replayed from scratch over the warm-up history; only bars after the gap can fire
+            state = {**_new_state(), 'prev_sentiment': state['prev_sentiment']}
+            replay_after = None
+
+        for bar_date, close in zip(*prices.get(ticker, ([], []))):
+            if close != close or (replay_after is not None and bar_date <= replay_after):
+                continue  # Missing bar, or already processed
+            for event_type, value in _apply_bar(state, close):
+                if not warming_up and bar_date > fire_after:
+                    fired.extend((ticker, bar_date, event_type, value, rule)
+                                 for rule in ticker_rules if _rule_matches(rule, event_type, value))
+            row.last_bar = bar_date
+
+        for day in sentiment_days.get(ticker, []):
+            if row.last_sentiment_day is not None and day.day <= row.last_sentiment_day:
+                continue
+            sentiment = day.score_sum / day.article_count
+            prev = state['prev_sentiment']
+            if prev is not None and not warming_up:
+                swing = sentiment - prev
+                fired.extend((ticker, day.day, 'sentiment_swing', swing, rule) for rule in ticker_rules
+                             if rule.rule_type == 'sentiment_swing'
+                             and abs(swing) >= (rule.threshold or DEFAULT_THRESHOLDS['sentiment_swing']))
+            state['prev_sentiment'] = sentiment
+            row.last_sentiment_day = day.day
+
+        row.state = json.dumps(state)
+        updated_states.append(row)
+
+    state_rows = [{'ticker': row.ticker, 'last_bar': row.last_bar, 'last_sentiment_day': row.last_sentiment_day,
+                   'state': row.state} for row in updated_states]
+    alert_rows = [{'ticker': ticker, 'rule_type': event_type, 'message': _describe(ticker, event_type, value),
+                   'bar_date': bar_date, 'fired_at': datetime.utcnow()}
+                  for ticker, bar_date, event_type, value, rule in fired]
+    with db.atomic():
+        # Batched to stay under SQLite's bound-parameter limit
+        for start in range(0, len(state_rows), 200):
+            TickerState.insert_many(state_rows[start:start + 200]).on_conflict_replace().execute()
+        for start in range(0, len(alert_rows), 100):
+            Alert.insert_many(alert_rows[start:start + 100]).execute()
+    return len(fired)
+
+
+def _acquire_evaluator_lease(owner):
+    now = time.time()
+    with db.atomic('IMMEDIATE'):
+        lease = EvaluatorLease.get_or_none(EvaluatorLease.name == 'alerts')
+        if lease is not None and lease.owner != owner and lease.expires_at > now:
+            return False
+        EvaluatorLease.insert(name='alerts', owner=owner, expires_at=now + LEASE_SECONDS).on_conflict_replace().execute()
+    return True
+
+
+def _evaluator_loop(owner):
+    while True:
+        try:
+            init_alert_store()
+            if _acquire_evaluator_lease(owner):
+                evaluate_watchlist()
+        except Exception:
+            logger.exception("Alert evaluation failed")
+        time.sleep(EVALUATION_INTERVAL)
+
+
+@st.cache_resource
+def start_alert_evaluator():
+    """
+    Starts the background evaluator thread once per process.
+
+    Every process runs the thread, but a lease in the alert store lets only one
+    of them evaluate at a time, so alerts are not fired twice.
+    """
+    thread = threading.Thread(target=_evaluator_loop, args=(uuid.uuid4().hex,), name="alert-evaluator", daemon=True)
+    thread.start()
+    return thread
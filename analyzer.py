@@ -1,8 +1,17 @@
+import atexit
+import os
+import re
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
 import pandas as pd
 import nltk
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
 import ta  # Technical Analysis library
 
+from frame_store import get_or_create_frame
+
 def initialize_nltk():
     """
     Downloads the VADER lexicon for sentiment analysis if not already present.
@@ -16,12 +25,62 @@ def initialize_nltk():
 # Initialize NLTK resources once when the module is imported
 initialize_nltk()
 
-def calculate_technical_indicators(stock_hist_df):
+# --- Technical Indicators ---
+
+# Relative error allowed in a windowed indicator versus computing it over the full history
+INDICATOR_TOLERANCE = 1e-6
+
+
+def ema_warmup_bars(span, tolerance=INDICATOR_TOLERANCE):
+    """Returns how many bars an EMA (adjust=False) needs before its seed weighs less than `tolerance`."""
+    alpha = 2.0 / (span + 1)
+    return int(np.ceil(np.log(tolerance) / np.log1p(-alpha)))
+
+
+# 'ta' features: the slowest default EMA span is 50 (STC) and the longest lookback is 52 bars (Ichimoku).
+# STC rescales that EMA by a short stochastic range, which can magnify its residual, hence the tighter tolerance
+TA_WARMUP_BARS = ema_warmup_bars(50, INDICATOR_TOLERANCE * 1e-3) + 52
+# Our own averages: an SMA needs exactly window - 1 prior bars, an EMA its convergence period
+MOVING_AVERAGES = {
+    'SMA_50': (lambda close: close.rolling(window=50).mean(), 49),
+    'SMA_200': (lambda close: close.rolling(window=200).mean(), 199),
+    'EMA_50': (lambda close: close.ewm(span=50, adjust=False).mean(), ema_warmup_bars(50)),
+    'EMA_200': (lambda close: close.ewm(span=200, adjust=False).mean(), ema_warmup_bars(200)),
+}
+
+
+def _add_cumulative_features(df_with_indicators, stock_hist_df):
+    # Running totals from the first bar never converge, so they are always computed over the
+    # full history; all are vectorized and cost little next to the windowed 'ta' features
+    close, volume = stock_hist_df['Close'], stock_hist_df['Volume']
+    rows = len(df_with_indicators)
+    features = {
+        'volume_adi': ta.volume.AccDistIndexIndicator(
+            stock_hist_df['High'], stock_hist_df['Low'], close, volume, fillna=True).acc_dist_index(),
+        'volume_obv': ta.volume.OnBalanceVolumeIndicator(close, volume, fillna=True).on_balance_volume(),
+        'volume_vpt': ta.volume.VolumePriceTrendIndicator(close, volume, fillna=True).volume_price_trend(),
+        'others_cr': ta.others.CumulativeReturnIndicator(close, fillna=True).cumulative_return(),
+    }
+    # Same recurrence as ta's NegativeVolumeIndexIndicator, as a cumulative product instead of a Python loop
+    factors = np.where(volume.shift(1) > volume, 1.0 + close.pct_change(), 1.0)
+    factors[0] = 1000.0
+    features['volume_nvi'] = pd.Series(np.cumprod(factors), index=close.index).fillna(1000)
+    for column, values in features.items():
+        df_with_indicators[column] = values.to_numpy()[-rows:]
+
+
+def calculate_technical_indicators(stock_hist_df, display_bars=None):
     """
     Calculates technical indicators for the given stock history.
 
+    With display_bars set, indicators are computed over just the last display_bars
+    rows plus each indicator's warm-up, so the cost follows what is shown rather
+    than the length of the history. The returned rows match a full computation
+    to within INDICATOR_TOLERANCE.
+
     Args:
         stock_hist_df (pd.DataFrame): DataFrame with historical stock data.
+        display_bars (int): Number of most recent rows to return, or None for every row.
 
     Returns:
         pd.DataFrame: DataFrame with added technical indicator columns.
@@ -29,9 +88,17 @@ def calculate_technical_indicators(stock_hist_df):
     if stock_hist_df.empty:
         return stock_hist_df
 
+    if display_bars is not None and len(stock_hist_df) <= display_bars + TA_WARMUP_BARS:
+        # Too short to be worth windowing; the full computation's tail is exact
+        return calculate_technical_indicators(stock_hist_df).iloc[-display_bars:]
+
+    windowed = display_bars is not None
+    source_df = stock_hist_df.iloc[-(display_bars + TA_WARMUP_BARS):] if windowed else stock_hist_df
+
     # Add all technical indicators using the 'ta' library
+    # ('ta' adds columns in place, and the input may be a shared read-only view)
     df_with_indicators = ta.add_all_ta_features(
-        stock_hist_df,
+        source_df.copy(),
         open="Open",
         high="High",
         low="Low",
@@ -39,12 +106,16 @@ def calculate_technical_indicators(stock_hist_df):
         volume="Volume",
         fillna=True  # Fill NaN values that are generated
     )
+    if windowed:
+        df_with_indicators = df_with_indicators.iloc[-display_bars:].copy()
+        _add_cumulative_features(df_with_indicators, stock_hist_df)
 
     # Explicitly calculate 50 and 200 period SMA and EMA for clarity
-    df_with_indicators['SMA_50'] = df_with_indicators['Close'].rolling(window=50).mean()
-    df_with_indicators['SMA_200'] = df_with_indicators['Close'].rolling(window=200).mean()
-    df_with_indicators['EMA_50'] = df_with_indicators['Close'].ewm(span=50, adjust=False).mean()
-    df_with_indicators['EMA_200'] = df_with_indicators['Close'].ewm(span=200, adjust=False).mean()
+    # (each over its own warm-up when windowed, since EMA_200 converges far more slowly than 'ta' features)
+    rows = len(df_with_indicators)
+    for column, (compute, warmup_bars) in MOVING_AVERAGES.items():
+        close = stock_hist_df['Close'].iloc[-(rows + warmup_bars):] if windowed else stock_hist_df['Close']
+        df_with_indicators[column] = compute(close).to_numpy()[-rows:]
 
 
     # Note: 'ta' already calculates the following, which we use in the main app:
@@ -54,26 +125,241 @@ def calculate_technical_indicators(stock_hist_df):
     return df_with_indicators
 
 
-def analyze_sentiment(articles):
+def get_indicator_frame(stock_hist_df, display_bars=None):
+    """
+    Returns the technical indicators for a price history held in the frame store.
+
+    Indicators are computed once per stored history and kept in the store too,
+    so every session and process shares one read-only copy.
+
+    Args:
+        stock_hist_df (pd.DataFrame): A history view returned by get_stock_data.
+        display_bars (int): Number of most recent rows needed, or None for every row.
+
+    Returns:
+        pd.DataFrame: A read-only DataFrame with added technical indicator columns.
+    """
+    key = stock_hist_df.attrs.get('frame_key')
+    if key is None or stock_hist_df.empty:
+        return calculate_technical_indicators(stock_hist_df, display_bars)
+    # Keyed by the history's version so a refreshed download never reuses stale indicators
+    indicator_key = f"{key}@{stock_hist_df.attrs['frame_version']}:indicators:{display_bars or 'all'}"
+    return get_or_create_frame(indicator_key, lambda: calculate_technical_indicators(stock_hist_df, display_bars))
+
+
+# --- News Sentiment Pipeline ---
+
+# Near-duplicate detection: MinHash signatures over word shingles, bucketed with LSH bands
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16  # 16 bands x 4 rows -> pairs above ~0.5 Jaccard almost always share a bucket
+DUPLICATE_THRESHOLD = 0.6  # Estimated Jaccard similarity at which two headlines count as one story
+SHINGLE_SIZE = 3
+
+# Scoring below this many texts stays in-process; a pool only pays off for large batches
+PARALLEL_MIN_TEXTS = 256
+SENTIMENT_WORKERS = int(os.environ.get("SENTIMENT_WORKERS", os.cpu_count() or 1))
+RECENCY_HALF_LIFE_HOURS = 48.0
+
+_MINHASH_PRIME = (1 << 31) - 1
+_minhash_rng = np.random.default_rng(20240101)
+_MINHASH_A = _minhash_rng.integers(1, _MINHASH_PRIME, size=MINHASH_PERMUTATIONS, dtype=np.int64)
+_MINHASH_B = _minhash_rng.integers(0, _MINHASH_PRIME, size=MINHASH_PERMUTATIONS, dtype=np.int64)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+_worker_sia = None
+_sentiment_pool = None
+
+
+def article_text(article):
+    """Returns the text scored for an article: its title plus description."""
+    parts = [article.get('title') or '', article.get('description') or '']
+    return '. '.join(p.strip() for p in parts if p and p.strip())
+
+
+def _minhash_signature(text):
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return None
+    if len(words) < SHINGLE_SIZE:
+        shingles = {' '.join(words)}
+    else:
+        shingles = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(sh.encode()) & 0x7FFFFFFF for sh in shingles), dtype=np.int64, count=len(shingles))
+    # (shingles x permutations) universal hashes; the column minimum is the signature
+    return ((hashes[:, None] * _MINHASH_A + _MINHASH_B) % _MINHASH_PRIME).min(axis=0)
+
+
+def collapse_near_duplicates(articles, known=()):
+    """
+    Groups syndicated copies of the same story so each story is counted once.
+
+    Headlines (falling back to the description) are compared with MinHash/LSH,
+    so the cost grows linearly with the number of articles rather than quadratically.
+
+    Args:
+        articles (list): A list of article dictionaries.
+        known (list): Stories already counted (e.g. stored earlier); articles that
+                      match one of them are dropped as copies.
+
+    Returns:
+        list: One representative article per story not in known (the earliest published
+              copy), in the original order. Articles without any text are dropped.
+    """
+    signatures, candidates, is_known = [], [], []
+    for flag, group in ((True, known), (False, articles)):
+        for article in group:
+            sig = _minhash_signature(article.get('title') or article.get('description') or '')
+            if sig is not None:
+                signatures.append(sig)
+                candidates.append(article)
+                is_known.append(flag)
+    if not any(not flag for flag in is_known):
+        return []
+
+    parent = list(range(len(candidates)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    sig_matrix = np.vstack(signatures)
+    for band in range(LSH_BANDS):
+        buckets = {}
+        for i, key in enumerate(map(bytes, sig_matrix[:, band * rows:(band + 1) * rows])):
+            j = buckets.setdefault(key, i)
+            if j != i and find(i) != find(j):
+                # Confirm the LSH candidate with the full signature before merging
+                if np.mean(sig_matrix[i] == sig_matrix[j]) >= DUPLICATE_THRESHOLD:
+                    parent[find(i)] = find(j)
+
+    known_stories = {find(i) for i, flag in enumerate(is_known) if flag}
+    representatives = {}
+    for i, article in enumerate(candidates):
+        root = find(i)
+        if root in known_stories:
+            continue
+        current = representatives.get(root)
+        if current is None or (article.get('publishedAt') or '') < (candidates[current].get('publishedAt') or ''):
+            representatives[root] = i
+    return [candidates[i] for i in sorted(representatives.values())]
+
+
+def _init_sentiment_worker():
+    global _worker_sia
+    _worker_sia = SentimentIntensityAnalyzer()
+
+
+def _score_chunk(texts):
+    global _worker_sia
+    if _worker_sia is None:
+        _init_sentiment_worker()
+    return [_worker_sia.polarity_scores(text)['compound'] for text in texts]
+
+
+def _get_sentiment_pool():
+    global _sentiment_pool
+    if _sentiment_pool is None:
+        # 'spawn' keeps workers independent of the Streamlit server's threads
+        _sentiment_pool = ProcessPoolExecutor(
+            max_workers=SENTIMENT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_sentiment_worker
+        )
+        # Stop the workers with the server instead of leaving them to the interpreter's teardown
+        atexit.register(_sentiment_pool.shutdown, wait=False, cancel_futures=True)
+    return _sentiment_pool
+
+
+def score_texts(texts):
+    """
+    Scores texts with VADER, fanning large batches out over a process pool.
+
+    Args:
+        texts (list): The strings to score.
+
+    Returns:
+        list: The VADER compound score of each text, in input order.
+    """
+    if len(texts) < PARALLEL_MIN_TEXTS or SENTIMENT_WORKERS < 2:
+        return _score_chunk(texts)
+    # A few chunks per worker balances load without paying per-text IPC
+    chunk_size = max(64, -(-len(texts) // (SENTIMENT_WORKERS * 4)))
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    scores = []
+    for chunk_scores in _get_sentiment_pool().map(_score_chunk, chunks):
+        scores.extend(chunk_scores)
+    return scores
+
+
+def recency_weighted_mean(scores, published_at, half_life_hours=RECENCY_HALF_LIFE_HOURS):
+    """
+    Averages scores with exponentially decaying weights by article age.
+
+    Args:
+        scores (array-like): Per-article sentiment scores.
+        published_at (array-like): Matching publication timestamps (missing values get the oldest weight).
+        half_life_hours (float): Age at which an article counts half as much as the newest one.
+
+    Returns:
+        float: The weighted average score, or 0.0 if there are no scores.
+    """
+    scores = np.asarray(scores, dtype=float)
+    if scores.size == 0:
+        return 0.0
+    timestamps = pd.to_datetime(pd.Series(published_at), utc=True, errors='coerce')
+    if timestamps.isna().all() or not half_life_hours:
+        return float(scores.mean())
+    # Ages are measured from the newest article; the weighted mean does not depend on the reference time
+    ages = (timestamps.max() - timestamps).dt.total_seconds().to_numpy() / 3600.0
+    ages = np.where(np.isnan(ages), np.nanmax(ages), ages)
+    weights = np.power(0.5, ages / half_life_hours)
+    return float(np.dot(weights, scores) / weights.sum())
+
+
+def score_articles(articles, dedupe=True, known=()):
+    """
+    Scores each article's title and description, optionally collapsing duplicates first.
+
+    Args:
+        articles (list): A list of article dictionaries.
+        dedupe (bool): Whether to collapse near-duplicate headlines before scoring.
+        known (list): Stories already counted; copies of them are not scored (dedupe only).
+
+    Returns:
+        list: (article, score) pairs for every article that has text to score.
+    """
+    if dedupe:
+        articles = collapse_near_duplicates(articles, known)
+    scored = [(a, article_text(a)) for a in articles]
+    scored = [(a, text) for a, text in scored if text]
+    scores = score_texts([text for _, text in scored])
+    return [(a, score) for (a, _), score in zip(scored, scores)]
+
+
+def analyze_sentiment(articles, half_life_hours=RECENCY_HALF_LIFE_HOURS):
     """
     Analyzes the sentiment of a list of news articles.
 
+    Near-duplicate headlines are counted once, each story is scored on its title
+    and description, and newer stories weigh more than older ones.
+
     Args:
         articles (list): A list of article dictionaries.
+        half_life_hours (float): Recency half-life for the weighting (0 for a plain average).
 
     Returns:
-        float: The average sentiment score of the articles.
+        float: The recency-weighted average sentiment score of the articles.
     """
     if not articles:
         return 0.0
 
-    sia = SentimentIntensityAnalyzer()
-    total_sentiment = 0
-    
-    for article in articles:
-        if article.get('title'):
-            sentiment = sia.polarity_scores(article['title'])
-            total_sentiment += sentiment['compound']
-            
-    return total_sentiment / len(articles) if articles else 0.0
+    scored = score_articles(articles)
+    return recency_weighted_mean(
+        [score for _, score in scored],
+        [a.get('publishedAt') for a, _ in scored],
+        half_life_hours
+    )
 
@@ -0,0 +1,110 @@
+import re
+import numpy as np
+
+# Rough token estimate for Gemini models (about four characters per token for English text)
+CHARS_PER_TOKEN = 4
+HISTORY_TOKEN_BUDGET = 3000  # Verbatim recent turns plus the rolled-up summary
+SUMMARY_TOKEN_BUDGET = 600
+MIN_RECENT_TURNS = 2
+SUMMARY_SNIPPET_CHARS = 160
+
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s')
+
+
+def estimate_tokens(text):
+    """Estimates the number of tokens in a piece of text."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _snippet(text):
+    # First sentence of a turn, clipped, as its one-line summary
+    text = ' '.join(text.split())
+    first = _SENTENCE_END_RE.split(text, maxsplit=1)[0]
+    if len(first) > SUMMARY_SNIPPET_CHARS:
+        first = first[:SUMMARY_SNIPPET_CHARS].rsplit(' ', 1)[0] + '...'
+    return first
+
+
+def build_chat_context(chat_history, token_budget=HISTORY_TOKEN_BUDGET, summary_budget=SUMMARY_TOKEN_BUDGET):
+    """
+    Splits the conversation into recent turns sent verbatim and a summary of older turns.
+
+    Turns are kept verbatim from the newest backwards until the budget is used
+    (always at least MIN_RECENT_TURNS); older turns are rolled into one-line
+    summaries, dropping the oldest lines if the summary outgrows its own budget.
+
+    Args:
+        chat_history (list): Messages as {'role', 'content'} dicts, oldest first.
+        token_budget (int): Approximate token budget for recent turns plus summary.
+        summary_budget (int): Approximate token budget for the summary alone.
+
+    Returns:
+        tuple: (recent, summary) where recent is the list of messages to send verbatim
+               and summary is a string ('' if nothing was rolled up).
+    """
+    remaining = token_budget - summary_budget
+    split = len(chat_history)
+    for i in range(len(chat_history) - 1, -1, -1):
+        cost = estimate_tokens(chat_history[i]['content'])
+        kept = len(chat_history) - i - 1
+        if cost > remaining and kept >= MIN_RECENT_TURNS:
+            break
+        remaining -= cost
+        split = i
+    recent = chat_history[split:]
+
+    lines = []
+    for message in chat_history[:split]:
+        speaker = 'User' if message['role'] == 'user' else 'InvestaBot'
+        lines.append(f"- {speaker}: {_snippet(message['content'])}")
+    while lines and estimate_tokens('\n'.join(lines)) > summary_budget:
+        lines.pop(0)
+    return recent, '\n'.join(lines)
+
+
+def _fmt(value, pattern):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "N/A"
+    return pattern.format(value)
+
+
+def build_stock_digest(ticker, hist_df, stock_info):
+    """
+    Summarizes the analyzed data into a few lines of numbers for the chatbot's context.
+
+    Computed once per analysis so every chat turn reuses it instead of sending raw data.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        hist_df (pd.DataFrame): Price history with technical indicator columns.
+        stock_info (dict): Company information from Yahoo Finance.
+
+    Returns:
+        str: A compact plain-text digest.
+    """
+    close = hist_df['Close']
+    latest = hist_df.iloc[-1]
+
+    def period_return(bars):
+        if len(close) <= bars:
+            return None
+        return close.iloc[-1] / close.iloc[-1 - bars] - 1
+
+    daily_returns = close.pct_change().dropna().tail(252)
+    volatility = daily_returns.std() * np.sqrt(252) if len(daily_returns) > 1 else None
+    dividend_yield = stock_info.get('dividendYield')
+
+    lines = [
+        f"{stock_info.get('longName', ticker)} ({ticker}), sector: {stock_info.get('sector', 'N/A')}",
+        f"As of {hist_df.index[-1]:%Y-%m-%d}: close {_fmt(latest['Close'], '${:.2f}')}, "
+        f"52-wk range {_fmt(stock_info.get('fiftyTwoWeekLow'), '${:.2f}')}-{_fmt(stock_info.get('fiftyTwoWeekHigh'), '${:.2f}')}",
+        f"Returns: 1d {_fmt(period_return(1), '{:+.1%}')}, 1m {_fmt(period_return(21), '{:+.1%}')}, "
+        f"3m {_fmt(period_return(63), '{:+.1%}')}, 1y {_fmt(period_return(252), '{:+.1%}')}; "
+        f"annualized volatility {_fmt(volatility, '{:.1%}')}",
+        f"SMA 50 {_fmt(latest.get('SMA_50'), '${:.2f}')}, SMA 200 {_fmt(latest.get('SMA_200'), '${:.2f}')}, "
+        f"RSI {_fmt(latest.get('momentum_rsi'), '{:.1f}')}, MACD {_fmt(latest.get('trend_macd'), '{:.2f}')} "
+        f"(signal {_fmt(latest.get('trend_macd_signal'), '{:.2f}')})",
+        f"Market cap {_fmt(stock_info.get('marketCap'), '${:,.0f}')}, P/E {_fmt(stock_info.get('trailingPE'), '{:.2f}')}, "
+        f"dividend yield {_fmt(dividend_yield * 100 if isinstance(dividend_yield, (int, float)) else None, '{:.2f}%')}",
+    ]
+    return '\n'.join(lines)
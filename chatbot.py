@@ -1,16 +1,23 @@
-import google.generativeai as genai
 import streamlit as st
 from google.api_core import exceptions as google_exceptions
+from llm_gateway import gemini_model, request_key, key_fingerprint, QUOTA_ERRORS
+from chat_context import build_chat_context, estimate_tokens
+from model_router import routed_call
 
-def get_chatbot_response(api_key, chat_history, user_prompt, stock_ticker):
+def get_chatbot_response(api_key, chat_history, user_prompt, stock_ticker, stock_digest=None):
     """
     Manages the conversational chat with the Gemini API with improved error handling.
 
+    Only recent turns are sent verbatim; older turns are rolled into a short
+    summary so the request size stays bounded in long conversations. Short turns
+    are answered by the fast model tier (see model_router).
+
     Args:
         api_key (str): The user's Google Gemini API key.
-        chat_history (list): The existing conversation history.
+        chat_history (list): The existing conversation history (not including user_prompt).
         user_prompt (str): The new prompt from the user.
         stock_ticker (str): The stock ticker currently being analyzed for context.
+        stock_digest (str): Optional compact numeric summary of the analyzed data.
 
     Returns:
         str: The response from the chatbot.
@@ -19,8 +26,6 @@ def get_chatbot_response(api_key, chat_history, user_prompt, stock_ticker):
         return "Error: Gemini API key is not provided. Please enter it in the sidebar."
         
     try:
-        genai.configure(api_key=api_key)
-        
         # System instruction to define the chatbot's persona and context
         system_instruction = f"""
         You are 'InvestaBot', a specialized financial assistant within the AI Investment Adviser app. 
@@ -30,26 +35,50 @@ def get_chatbot_response(api_key, chat_history, user_prompt, stock_ticker):
         Do not hallucinate or provide financial advice that you are not qualified to give.
         Your goal is to help the user understand the data presented in the app.
         """
-        
-        model = genai.GenerativeModel(
-            model_name='gemini-2.5-pro',
-            system_instruction=system_instruction
-        )
+        if stock_digest:
+            system_instruction += f"""
+        Ground your answers in this data from the app's analysis:
+        {stock_digest}
+        """
 
+        recent_history, summary = build_chat_context(chat_history)
+        if summary:
+            system_instruction += f"""
+        Summary of the earlier conversation:
+        {summary}
+        """
+        
         history_for_api = []
-        for message in chat_history:
+        for message in recent_history:
             role = 'user' if message['role'] == 'user' else 'model'
             history_for_api.append({'role': role, 'parts': [message['content']]})
 
-        chat = model.start_chat(history=history_for_api)
-        response = chat.send_message(user_prompt)
-        
-        return response.text
+        def build(model_name, timeout):
+            model = gemini_model(api_key, model_name, system_instruction)
+
+            def send():
+                chat = model.start_chat(history=history_for_api)
+                return chat.send_message(user_prompt, request_options={'timeout': timeout}).text
+
+            key = request_key('chat', model_name, system_instruction, history_for_api, user_prompt, key_fingerprint(api_key))
+            return key, send
+
+        # Short turns go to the fast model; longer ones to the pro model, with the fast one as fallback
+        response, _ = routed_call('chat', build, prompt_tokens=estimate_tokens(user_prompt))
+        return response
 
     except google_exceptions.PermissionDenied as e:
         error_message = "Authentication Error: Your Gemini API key is invalid or has expired. Please check your key in the sidebar and try again."
         st.error(error_message)
         return error_message
+    except TimeoutError as e:
+        error_message = "Timeout: the Gemini API did not answer in time. Please try again in a moment."
+        st.error(error_message)
+        return error_message
+    except QUOTA_ERRORS as e:
+        error_message = "Rate Limit: the Gemini API is busy and still refusing requests after several retries. Please wait a minute and try again."
+        st.error(error_message)
+        return error_message
     except Exception as e:
         error_message = f"An unexpected error occurred with the Gemini API: {e}"
         st.error(error_message)
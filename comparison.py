@@ -0,0 +1,109 @@
+import re
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+VOLATILITY_WINDOW = 21  # Rolling window (trading days) for the volatility lines
+MAX_CHART_POINTS = 500  # Points per line sent to the browser
+MAX_TICKERS = 30
+
+
+def parse_tickers(text):
+    """
+    Parses a free-form list of tickers separated by commas, spaces or new lines.
+
+    Args:
+        text (str): The raw text from the tickers box.
+
+    Returns:
+        list: Upper-cased, de-duplicated tickers in entry order (at most MAX_TICKERS).
+    """
+    tickers = [t.upper() for t in re.split(r"[\s,;]+", text) if t]
+    return list(dict.fromkeys(tickers))[:MAX_TICKERS]
+
+
+def align_prices(prices):
+    """
+    Aligns closing prices on a shared index that starts once every ticker is trading.
+
+    Args:
+        prices (pd.DataFrame): Closing prices, one column per ticker.
+
+    Returns:
+        pd.DataFrame: Prices with no missing values (short gaps are carried forward).
+    """
+    prices = prices.sort_index().ffill(limit=5)
+    return prices.dropna()
+
+
+def compare_prices(prices, vol_window=VOLATILITY_WINDOW):
+    """
+    Computes the comparison series and per-ticker statistics in one pass over the price matrix.
+
+    Args:
+        prices (pd.DataFrame): Aligned closing prices from align_prices.
+        vol_window (int): Trading days in the rolling volatility window.
+
+    Returns:
+        dict: 'normalized' (growth of 100), 'relative_strength' (versus the equal-weighted
+              group average, 100 = in line), 'rolling_volatility' (annualized) DataFrames,
+              and 'stats', one row per ticker.
+    """
+    values = prices.to_numpy(dtype=float)
+    normalized = values / values[0] * 100
+    group = normalized.mean(axis=1, keepdims=True)
+    relative_strength = normalized / group * 100
+
+    returns = values[1:] / values[:-1] - 1
+    # Rolling variance from cumulative sums: one O(T x N) pass whatever the window
+    padded = np.vstack([np.zeros((1, values.shape[1])), returns])
+    sums = np.cumsum(padded, axis=0)
+    sums_sq = np.cumsum(padded ** 2, axis=0)
+    window_sum = sums[vol_window:] - sums[:-vol_window]
+    window_sum_sq = sums_sq[vol_window:] - sums_sq[:-vol_window]
+    variance = (window_sum_sq - window_sum ** 2 / vol_window) / (vol_window - 1)
+    rolling_volatility = np.full_like(values, np.nan)
+    rolling_volatility[vol_window:] = np.sqrt(np.clip(variance, 0, None) * TRADING_DAYS)
+
+    years = max(len(returns), 1) / TRADING_DAYS
+    total_return = values[-1] / values[0] - 1
+    volatility = returns.std(axis=0, ddof=1) * np.sqrt(TRADING_DAYS) if len(returns) > 1 else np.full(values.shape[1], np.nan)
+    annual_return = (1 + total_return) ** (1 / years) - 1
+    drawdown = values / np.maximum.accumulate(values, axis=0) - 1
+    group_returns = returns.mean(axis=1)
+    group_variance = group_returns.var(ddof=1) if len(returns) > 1 else np.nan
+    beta = ((returns - returns.mean(axis=0)).T @ (group_returns - group_returns.mean())) / (len(returns) - 1) / group_variance
+
+    stats = pd.DataFrame({
+        'Total Return': total_return,
+        'Annualized Return': annual_return,
+        'Volatility': volatility,
+        'Sharpe': np.divide(annual_return, volatility, out=np.full_like(volatility, np.nan), where=volatility > 0),
+        'Max Drawdown': drawdown.min(axis=0),
+        'Beta to Group': beta,
+        'Relative Strength': relative_strength[-1],
+    }, index=prices.columns)
+
+    return {
+        'normalized': pd.DataFrame(normalized, index=prices.index, columns=prices.columns),
+        'relative_strength': pd.DataFrame(relative_strength, index=prices.index, columns=prices.columns),
+        'rolling_volatility': pd.DataFrame(rolling_volatility, index=prices.index, columns=prices.columns),
+        'stats': stats.sort_values('Total Return', ascending=False),
+    }
+
+
+def downsample(frame, max_points=MAX_CHART_POINTS):
+    """
+    Thins a time series frame to at most max_points evenly spaced rows, keeping the first and last.
+
+    Args:
+        frame (pd.DataFrame): The series to plot, sharing one index.
+        max_points (int): The maximum number of rows to keep.
+
+    Returns:
+        pd.DataFrame: The thinned frame (the input itself if it is already small enough).
+    """
+    if len(frame) <= max_points:
+        return frame
+    positions = np.unique(np.linspace(0, len(frame) - 1, max_points).round().astype(int))
+    return frame.iloc[positions]
@@ -1,47 +1,155 @@
 import yfinance as yf
+import pandas as pd
 import requests
 import streamlit as st
 
-@st.cache_data(show_spinner="Fetching stock data...")
-def get_stock_data(ticker, period="1y"):
-    """
-    Fetches historical stock data and company information from Yahoo Finance.
-    
-    Args:
-        ticker (str): The stock ticker symbol.
-        period (str): The time period for historical data (e.g., "1y", "6mo").
+from shared_cache import shared_cache
+from fetch_scheduler import get_scheduler
+from frame_store import frame_key, get_frame, put_frame
 
-    Returns:
-        tuple: A tuple containing the stock's info dictionary and a DataFrame of historical data.
-               Returns (None, None) if the ticker is invalid or data cannot be fetched.
-    """
+STOCK_DATA_TTL = 3600
+
+def _download_stock_data(ticker, period):
+    # Returns (info, hist) straight from Yahoo Finance, or (None, None) on failure
     try:
         stock = yf.Ticker(ticker)
+        # Interactive requests share the adaptive Yahoo limit but jump ahead of background refreshes
+        scheduler = get_scheduler()
         # Fetch info dictionary first to check if the ticker is valid
-        info = stock.info
+        info = scheduler.call(lambda: stock.info)
         if not info or info.get('trailingPE') is None: # A simple check for valid ticker data
              st.error(f"No data found for ticker '{ticker}'. It might be delisted or an incorrect symbol.")
              return None, None
              
-        hist = stock.history(period=period)
+        hist = scheduler.call(lambda: stock.history(period=period))
         if hist.empty:
             st.error(f"No historical data found for ticker '{ticker}'.")
             return None, None
             
-        # Return the info dictionary directly, which is serializable
         return info, hist
     except Exception as e:
         st.error(f"Error fetching stock data for {ticker}: {e}")
         return None, None
 
-@st.cache_data(show_spinner="Fetching latest news...")
-def get_news_data(ticker, api_key):
+@st.cache_data(show_spinner="Fetching stock data...", ttl=STOCK_DATA_TTL)
+@shared_cache(ttl=STOCK_DATA_TTL, should_cache=lambda info: info is not None)
+def _fetch_stock_info(ticker, period):
+    # Only the small info dict goes through the pickling caches; the history is written to the frame store
+    info, hist = _download_stock_data(ticker, period)
+    if info is not None:
+        put_frame(frame_key('hist', ticker, period), hist)
+    return info
+
+def get_stock_data(ticker, period="1y"):
+    """
+    Fetches historical stock data and company information from Yahoo Finance.
+
+    The history is held once in the shared Arrow frame store and returned as a
+    read-only, zero-copy view, so cache hits neither deserialize nor duplicate it.
+    
+    Args:
+        ticker (str): The stock ticker symbol.
+        period (str): The time period for historical data (e.g., "1y", "6mo").
+
+    Returns:
+        tuple: A tuple containing the stock's info dictionary and a read-only DataFrame of historical data.
+               Returns (None, None) if the ticker is invalid or data cannot be fetched.
+    """
+    info = _fetch_stock_info(ticker, period)
+    if info is None:
+        return None, None
+    key = frame_key('hist', ticker, period)
+    hist = get_frame(key)
+    if hist is None:
+        # The frame store was cleared (e.g. /dev/shm after a reboot) while the info was still cached
+        info, hist = _download_stock_data(ticker, period)
+        if info is None:
+            return None, None
+        hist = put_frame(key, hist)
+    return info, hist
+
+def download_price_history(tickers, period="1y"):
+    """
+    Downloads daily closing prices for several tickers in one batched Yahoo Finance request.
+
+    Uncached, and raises on network errors, so background jobs can use it outside a Streamlit session.
+
+    Args:
+        tickers (list): The stock ticker symbols.
+        period (str): The time period for historical data (e.g., "1y", "5d").
+
+    Returns:
+        pd.DataFrame: Closing prices with one column per ticker (tickers with no data are dropped).
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return pd.DataFrame()
+    data = yf.download(tickers, period=period, auto_adjust=True, group_by='column',
+                       progress=False, threads=True)
+    if data.empty:
+        return pd.DataFrame()
+
+    closes = data['Close']
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(tickers[0])
+    return closes.reindex(columns=[t for t in tickers if t in closes.columns]).dropna(axis=1, how='all')
+
+@st.cache_data(show_spinner="Fetching price history...", ttl=STOCK_DATA_TTL)
+@shared_cache(ttl=STOCK_DATA_TTL, should_cache=lambda prices: not prices.empty)
+def get_price_history(tickers, period="1y"):
+    """
+    Fetches daily closing prices for several tickers in one batched Yahoo Finance request.
+
+    Uses the same adjusted daily bars as get_stock_data, aligned on a shared date index.
+
+    Args:
+        tickers (tuple): The stock ticker symbols.
+        period (str): The time period for historical data (e.g., "1y", "6mo").
+
+    Returns:
+        pd.DataFrame: Closing prices with one column per ticker (tickers with no data are dropped),
+                      or an empty DataFrame if nothing could be fetched.
+    """
+    try:
+        return download_price_history(tickers, period)
+    except Exception as e:
+        st.error(f"Error fetching price history: {e}")
+        return pd.DataFrame()
+
+def download_news(ticker, api_key, since=None, until=None, page_size=20):
+    """
+    Fetches one page of news articles, newest first, straight from NewsAPI.
+
+    Args:
+        ticker (str): The stock ticker symbol to search for in news.
+        api_key (str): Your personal NewsAPI key.
+        since (str): Optional ISO 8601 timestamp; only articles published at or after it are returned.
+        until (str): Optional ISO 8601 timestamp; only articles published at or before it are returned.
+        page_size (int): Maximum number of articles to return (NewsAPI allows up to 100).
+
+    Returns:
+        list: A list of news articles. Raises requests.exceptions.RequestException on failure.
+    """
+    url = f'https://newsapi.org/v2/everything?q={ticker}&apiKey={api_key}&language=en&sortBy=publishedAt&pageSize={page_size}'
+    if since:
+        url += f'&from={since}'
+    if until:
+        url += f'&to={until}'
+    response = requests.get(url)
+    response.raise_for_status()  # Raise an exception for bad status codes
+    return response.json().get('articles', [])
+
+@st.cache_data(show_spinner="Fetching latest news...", ttl=900)
+@shared_cache(ttl=900, should_cache=bool)
+def get_news_data(ticker, api_key, since=None, page_size=20):
     """
     Fetches news articles related to a stock ticker from NewsAPI.
 
     Args:
         ticker (str): The stock ticker symbol to search for in news.
         api_key (str): Your personal NewsAPI key.
+        since (str): Optional ISO 8601 timestamp; only articles published at or after it are returned.
+        page_size (int): Maximum number of articles to return (NewsAPI allows up to 100).
 
     Returns:
         list: A list of news articles, or an empty list if an error occurs.
@@ -50,11 +158,7 @@ def get_news_data(ticker, api_key):
         st.warning("NewsAPI key not provided. News analysis will be skipped.")
         return []
     try:
-        url = f'https://newsapi.org/v2/everything?q={ticker}&apiKey={api_key}&language=en&sortBy=publishedAt&pageSize=20'
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        articles = response.json().get('articles', [])
-        return articles
+        return download_news(ticker, api_key, since=since, page_size=page_size)
     except requests.exceptions.RequestException as e:
         st.warning(f"Could not fetch news. Please check your NewsAPI key. Error: {e}")
         return []
@@ -77,82 +77,168 @@
 
 # discover.py
 
+import json
+import os
 import streamlit as st
 import pandas as pd
 import requests
 from collections import defaultdict
 
+from shared_cache import shared_cache
+
 # NOTE: Ensure lxml is installed: pip install lxml
 
-@st.cache_data(ttl=86400)
-def discover_stocks_yfinance():
+# Returned when the Wikipedia list cannot be fetched; never stored in the shared cache
+FALLBACK_STOCKS = {
+    "Technology": [{"symbol": "AAPL", "description": "Apple Inc."}, {"symbol": "MSFT", "description": "Microsoft"}],
+    "Consumer": [{"symbol": "AMZN", "description": "Amazon.com"}]
+}
+
+def download_sp500_stocks():
     """
-    Fetches S&P 500 tickers from Wikipedia.
+    Downloads the S&P 500 constituents from Wikipedia, grouped by GICS sector.
+
+    Raises on failure and makes no Streamlit calls, so background jobs can use it too.
     Robustness: Iterates through all tables to find the one with a 'Symbol' column.
+
+    Returns:
+        dict: Mapping of sector name to a list of {'symbol', 'description'} dicts, sorted by sector.
     """
     categorized_stocks = defaultdict(list)
+    url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
     
-    try:
-        st.info("Fetching S&P 500 stock list...")
-        url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    
+    response = requests.get(url, headers=headers)
+    response.raise_for_status()
+    
+    # Fetch ALL tables (do not filter by match text yet)
+    tables = pd.read_html(response.text)
+    
+    sp500_df = None
+    
+    # Iterate through found tables to find the correct one
+    for table in tables:
+        # We look for the table that has 'Symbol' in its columns
+        if 'Symbol' in table.columns:
+            sp500_df = table
+            break
+    
+    if sp500_df is None:
+        raise ValueError("Found tables, but none contained a 'Symbol' column.")
+
+    # Iterate through the correct DataFrame
+    for index, row in sp500_df.iterrows():
+        ticker_symbol = row.get('Symbol')
+        company_name = row.get('Security')
         
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
+        # Try to find the sector column (it is usually 'GICS Sector')
+        # If not found, default to "Uncategorized"
+        sector = row.get('GICS Sector')
         
-        # Fetch ALL tables (do not filter by match text yet)
-        tables = pd.read_html(response.text)
+        if not sector and 'Sector' in row:
+            sector = row['Sector']
         
-        sp500_df = None
+        if not sector:
+            sector = "Other"
         
-        # Iterate through found tables to find the correct one
-        for table in tables:
-            # We look for the table that has 'Symbol' in its columns
-            if 'Symbol' in table.columns:
-                sp500_df = table
-                break
+        # Skip rows if Symbol is missing
+        if pd.isna(ticker_symbol):
+            continue
+
+        # Convert to string and fix formatting (BRK.B -> BRK-B)
+        ticker_symbol = str(ticker_symbol).replace('.', '-')
         
-        if sp500_df is None:
-            raise ValueError("Found tables, but none contained a 'Symbol' column.")
+        categorized_stocks[sector].append({
+            'symbol': ticker_symbol,
+            'description': company_name
+        })
 
-        # Iterate through the correct DataFrame
-        for index, row in sp500_df.iterrows():
-            ticker_symbol = row.get('Symbol')
-            company_name = row.get('Security')
-            
-            # Try to find the sector column (it is usually 'GICS Sector')
-            # If not found, default to "Uncategorized"
-            sector = row.get('GICS Sector')
-            
-            if not sector and 'Sector' in row:
-                sector = row['Sector']
-            
-            if not sector:
-                sector = "Other"
-            
-            # Skip rows if Symbol is missing
-            if pd.isna(ticker_symbol):
-                continue
+    return dict(sorted(categorized_stocks.items()))
 
-            # Convert to string and fix formatting (BRK.B -> BRK-B)
-            ticker_symbol = str(ticker_symbol).replace('.', '-')
-            
-            categorized_stocks[sector].append({
-                'symbol': ticker_symbol,
-                'description': company_name
-            })
 
+@st.cache_data(ttl=86400)
+@shared_cache(ttl=86400, should_cache=lambda stocks: stocks is not FALLBACK_STOCKS)
+def discover_stocks_yfinance():
+    """
+    Fetches S&P 500 tickers from Wikipedia.
+    Falls back to a short curated list if the page cannot be fetched or parsed.
+    """
+    try:
+        st.info("Fetching S&P 500 stock list...")
+        categorized_stocks = download_sp500_stocks()
         st.success("Discovery data loaded successfully!")
 
     except Exception as e:
         st.error(f"Failed to fetch data: {e}")
         # Fallback data
-        return {
-            "Technology": [{"symbol": "AAPL", "description": "Apple Inc."}, {"symbol": "MSFT", "description": "Microsoft"}],
-            "Consumer": [{"symbol": "AMZN", "description": "Amazon.com"}]
-        }
+        return FALLBACK_STOCKS
     
-    return dict(sorted(categorized_stocks.items()))
\ No newline at end of file
+    return categorized_stocks
+
+
+@st.cache_data
+def stocks_to_frame(categorized_stocks):
+    """
+    Flattens the categorized stock dictionary into a single table.
+
+    Args:
+        categorized_stocks (dict): Mapping of sector name to a list of {'symbol', 'description'} dicts.
+
+    Returns:
+        pd.DataFrame: One row per stock with 'Symbol', 'Company' and 'Sector' columns.
+    """
+    rows = [
+        {'Symbol': stock['symbol'], 'Company': stock['description'], 'Sector': sector}
+        for sector, stocks in categorized_stocks.items()
+        for stock in stocks
+    ]
+    return pd.DataFrame(rows, columns=['Symbol', 'Company', 'Sector'])
+
+
+def filter_stocks(stocks_df, query="", sector=None):
+    """
+    Filters the stock table by a free-text query and an optional sector.
+
+    Args:
+        stocks_df (pd.DataFrame): Table produced by stocks_to_frame.
+        query (str): Case-insensitive text matched against symbol and company name.
+        sector (str): Sector to keep, or None for all sectors.
+
+    Returns:
+        pd.DataFrame: The matching rows, with a fresh positional index.
+    """
+    mask = pd.Series(True, index=stocks_df.index)
+    if sector:
+        mask &= stocks_df['Sector'] == sector
+    query = query.strip()
+    if query:
+        mask &= (
+            stocks_df['Symbol'].str.contains(query, case=False, regex=False)
+            | stocks_df['Company'].astype(str).str.contains(query, case=False, regex=False)
+        )
+    return stocks_df[mask].reset_index(drop=True)
+
+
+@st.cache_data(show_spinner=False)
+def _read_json_file(path, mtime):
+    # 'mtime' is only part of the cache key, so an edited file is re-read once
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def load_raw_stock_list(path='sp500_categorized.json'):
+    """
+    Loads the raw categorized stock list from disk, cached by file modification time.
+
+    Args:
+        path (str): Path to the JSON file written by generate_stock_list.py.
+
+    Returns:
+        dict: The parsed JSON data, or None if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+    return _read_json_file(path, os.path.getmtime(path))
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+
+from data_fetcher import get_price_history
+from news_store import get_article_events
+
+# Event windows in trading days relative to the event day (day 0), inclusive at both ends
+DEFAULT_WINDOWS = ((0, 0), (0, 1), (0, 5), (1, 5), (-1, 1))
+# VADER compound score buckets; +/-0.05 is VADER's own neutral band
+SENTIMENT_BINS = [-1.0, -0.5, -0.05, 0.05, 0.5, 1.0]
+SENTIMENT_LABELS = ["Strong Negative", "Negative", "Neutral", "Positive", "Strong Positive"]
+MARKET_TIMEZONE = "America/New_York"
+MARKET_CLOSE = pd.Timedelta(hours=16)
+BENCHMARK = "SPY"
+MIN_EVENTS = 10  # Below this the per-bucket averages are too noisy to show
+
+
+def window_label(window):
+    """Formats an event window as e.g. '[0, +5]'."""
+    start, end = (f"{day:+d}" if day else "0" for day in window)
+    return f"[{start}, {end}]"
+
+
+def session_closes(price_index):
+    """
+    Returns the closing time (UTC) of each daily bar.
+
+    Args:
+        price_index (pd.DatetimeIndex): Daily bar dates, timezone-naive or exchange-local.
+
+    Returns:
+        np.ndarray: datetime64 closing times in UTC, one per bar.
+    """
+    days = price_index.tz_localize(None) if price_index.tz is not None else price_index
+    closes = (days.normalize() + MARKET_CLOSE).tz_localize(MARKET_TIMEZONE).tz_convert('UTC')
+    return closes.tz_localize(None).to_numpy()
+
+
+def abnormal_returns(prices, benchmark=None):
+    """
+    Computes daily abnormal returns.
+
+    With a benchmark this is the market-adjusted model (stock minus benchmark return);
+    without one, returns are measured against their own mean over the sample.
+
+    Args:
+        prices (pd.Series): Daily closing prices of the stock.
+        benchmark (pd.Series): Optional benchmark closing prices on the same index.
+
+    Returns:
+        np.ndarray: Abnormal return of each bar (NaN for the first bar).
+    """
+    returns = prices.pct_change(fill_method=None).to_numpy(dtype=float)
+    if benchmark is not None:
+        return returns - benchmark.pct_change(fill_method=None).to_numpy(dtype=float)
+    return returns - np.nanmean(returns)
+
+
+def run_event_study(prices, events, windows=DEFAULT_WINDOWS, benchmark=None, one_per_day=True):
+    """
+    Measures cumulative abnormal returns (CAR) around news events, bucketed by sentiment.
+
+    Each article is assigned to the first session whose close comes after it was
+    published, so after-hours news counts towards the next session (day 0). Every
+    window of every event is computed at once from a cumulative sum of abnormal
+    returns, with no per-article loop.
+
+    Args:
+        prices (pd.Series): Daily closing prices of the stock.
+        events (pd.DataFrame): 'published_at' (timezone-aware) and 'sentiment' columns.
+        windows (tuple): (start, end) trading-day offsets from day 0, inclusive.
+        benchmark (pd.Series): Optional benchmark prices for market-adjusted returns.
+        one_per_day (bool): Average the sentiment of events sharing a day 0 into one event,
+                            so a busy news day does not count several times.
+
+    Returns:
+        dict: 'events' (one row per event with its CAR per window), 'summary' (per bucket
+              and window: event count, mean and median CAR, t-statistic and hit rate) and
+              'information_coefficient' (correlation of sentiment with CAR, per window).
+    """
+    prices = prices.dropna()
+    if benchmark is not None:
+        benchmark = benchmark.reindex(prices.index).ffill()
+    closes = session_closes(prices.index)
+    published = events['published_at'].dt.tz_convert('UTC').dt.tz_localize(None).to_numpy()
+    day0 = np.searchsorted(closes, published, side='right')
+    sentiment = events['sentiment'].to_numpy(dtype=float)
+
+    # Events after the last close have no reaction yet
+    in_range = day0 < len(prices)
+    day0, published, sentiment = day0[in_range], published[in_range], sentiment[in_range]
+    if one_per_day:
+        collapsed = (pd.DataFrame({'day0': day0, 'sentiment': sentiment, 'published': published})
+                     .groupby('day0').agg(sentiment=('sentiment', 'mean'), published=('published', 'min')))
+        day0 = collapsed.index.to_numpy()
+        sentiment = collapsed['sentiment'].to_numpy()
+        published = collapsed['published'].to_numpy()
+
+    ar = abnormal_returns(prices, benchmark)
+    # cum[i] is the sum of abnormal returns of bars 0..i-1, so a window [a, b] sums to cum[b + 1] - cum[a]
+    cum = np.concatenate([[0.0], np.cumsum(np.nan_to_num(ar))])
+    offsets = np.asarray(windows, dtype=int)
+    starts = day0[:, None] + offsets[:, 0]
+    ends = day0[:, None] + offsets[:, 1]
+    # Bar 0 has no return, and windows must end inside the history
+    valid = (starts >= 1) & (ends < len(prices))
+    car = np.where(valid, cum[np.clip(ends + 1, 0, len(prices))] - cum[np.clip(starts, 0, len(prices))], np.nan)
+
+    labels = [window_label(w) for w in windows]
+    event_frame = pd.DataFrame(car, columns=labels)
+    event_frame.insert(0, 'sentiment', sentiment)
+    event_frame.insert(0, 'day0', prices.index[day0])
+    event_frame.insert(0, 'published_at', pd.to_datetime(published).tz_localize('UTC'))
+    event_frame['bucket'] = pd.cut(event_frame['sentiment'], SENTIMENT_BINS, labels=SENTIMENT_LABELS, include_lowest=True)
+
+    long = event_frame.melt(id_vars=['bucket', 'sentiment'], value_vars=labels, var_name='window', value_name='car')
+    long = long.dropna(subset=['car'])
+    # Hit: the move has the sign the sentiment pointed to (undefined for neutral events)
+    long['hit'] = np.where(np.abs(long['sentiment']) > 0.05,
+                           np.sign(long['car']) == np.sign(long['sentiment']), np.nan)
+    grouped = long.groupby(['bucket', 'window'], observed=True, sort=False)['car']
+    summary = grouped.agg(events='count', mean_car='mean', median_car='median', std_car='std')
+    summary['t_stat'] = summary['mean_car'] / (summary['std_car'] / np.sqrt(summary['events']))
+    summary['hit_rate'] = long.groupby(['bucket', 'window'], observed=True, sort=False)['hit'].mean()
+    summary = summary.drop(columns='std_car').reset_index()
+    summary['bucket'] = pd.Categorical(summary['bucket'], categories=SENTIMENT_LABELS, ordered=True)
+    summary['window'] = pd.Categorical(summary['window'], categories=labels, ordered=True)
+    summary = summary.sort_values(['window', 'bucket']).reset_index(drop=True)
+
+    information_coefficient = event_frame[labels].corrwith(event_frame['sentiment'])
+
+    return {'events': event_frame, 'summary': summary, 'information_coefficient': information_coefficient}
+
+
+def study_ticker_news(ticker, period="2y", windows=DEFAULT_WINDOWS):
+    """
+    Runs the event study on every stored article for a ticker, market-adjusted against SPY.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        period (str): The price history period to align the articles with.
+        windows (tuple): (start, end) trading-day offsets from day 0, inclusive.
+
+    Returns:
+        dict: The run_event_study result, or None if there are fewer than MIN_EVENTS usable events.
+    """
+    events = get_article_events(ticker)
+    if len(events) < MIN_EVENTS:
+        return None
+    # The stock and the benchmark come from one batched download on a shared index
+    prices = get_price_history((ticker, BENCHMARK), period)
+    if ticker not in prices.columns:
+        return None
+    benchmark = prices[BENCHMARK] if BENCHMARK in prices.columns and ticker != BENCHMARK else None
+    result = run_event_study(prices[ticker], events, windows, benchmark)
+    if len(result['events']) < MIN_EVENTS:
+        return None
+    return result
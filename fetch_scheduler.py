@@ -0,0 +1,263 @@
+import json
+import os
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from curl_cffi.requests import exceptions as curl_exceptions
+from peewee import SqliteDatabase, Model, CharField, TextField, DateTimeField, CompositeKey
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, stop_any, wait_random_exponential
+from yfinance.exceptions import YFRateLimitError
+
+from storage import open_database
+
+# Concurrency window shared by every Yahoo Finance request this process makes
+INITIAL_CONCURRENCY = float(os.environ.get("YAHOO_INITIAL_CONCURRENCY", "4"))
+MAX_CONCURRENCY = int(os.environ.get("YAHOO_MAX_CONCURRENCY", "16"))
+MAX_ATTEMPTS = int(os.environ.get("YAHOO_MAX_ATTEMPTS", "4"))
+RETRY_BUDGET_RATIO = 0.2  # A bulk run may retry at most this fraction of its symbols (plus a small floor)
+MIN_RETRY_BUDGET = 10
+
+INTERACTIVE, BACKGROUND = 0, 1
+
+# 429s and timeouts mean "slow down", not "this symbol is bad"
+THROTTLE_ERRORS = (YFRateLimitError, curl_exceptions.Timeout, requests.exceptions.Timeout, TimeoutError)
+
+
+def is_throttle_error(exc):
+    """Returns True for errors that signal Yahoo throttling rather than a bad request."""
+    return isinstance(exc, THROTTLE_ERRORS) or 'Too Many Requests' in str(exc)
+
+
+class AdaptiveLimiter:
+    """
+    An AIMD concurrency limit with priority admission.
+
+    Each success grows the limit by 1/limit (about +1 per window of successes);
+    a throttled request halves it, at most once per window, since the requests
+    already in flight when throttling starts tend to fail together. Waiting
+    interactive requests are always admitted before background ones.
+    """
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=1, maximum=MAX_CONCURRENCY):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._epoch = 0  # Bumped on every decrease; throttles from older epochs are ignored
+        self._waiting = [0, 0]
+        self._cond = threading.Condition()
+
+    def acquire(self, priority=BACKGROUND):
+        """Waits for a slot and returns a token to pass to release."""
+        with self._cond:
+            self._waiting[priority] += 1
+            while self.in_flight >= int(self.limit) or any(self._waiting[:priority]):
+                self._cond.wait()
+            self._waiting[priority] -= 1
+            self.in_flight += 1
+            return self._epoch
+
+    def release(self, token, throttled=False):
+        """
+        Frees a slot and adjusts the limit.
+
+        Args:
+            token (int): The value returned by acquire.
+            throttled (bool): Whether the request was throttled.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                if token == self._epoch:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._epoch += 1
+            else:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+class RetryBudget:
+    """A fixed number of retries shared by every request of one bulk run."""
+
+    def __init__(self, retries):
+        self.remaining = retries
+        self._lock = threading.Lock()
+
+    def exhausted(self, retry_state=None):
+        """Tenacity stop condition: spends one retry, or stops when none are left."""
+        with self._lock:
+            if self.remaining <= 0:
+                return True
+            self.remaining -= 1
+            return False
+
+
+class FetchScheduler:
+    """Runs Yahoo Finance requests under one adaptive concurrency limit."""
+
+    def __init__(self, limiter=None, max_attempts=MAX_ATTEMPTS):
+        self.limiter = limiter or AdaptiveLimiter()
+        self.max_attempts = max_attempts
+
+    def call(self, fn, *args, priority=INTERACTIVE, budget=None):
+        """
+        Runs fn(*args) in the calling thread once a slot is free, retrying throttled attempts.
+
+        Args:
+            fn (callable): Makes the request.
+            *args: Arguments for fn.
+            priority (int): INTERACTIVE (a user is waiting) or BACKGROUND.
+            budget (RetryBudget): Optional shared budget that also limits retries.
+
+        Returns:
+            The value returned by fn (or raises the last exception it raised).
+        """
+        stop = stop_after_attempt(self.max_attempts)
+        if budget is not None:
+            stop = stop_any(stop, budget.exhausted)
+        retrying = Retrying(
+            retry=retry_if_exception(is_throttle_error),
+            wait=wait_random_exponential(multiplier=1, max=30),
+            stop=stop,
+            reraise=True
+        )
+        for attempt in retrying:
+            with attempt:
+                token = self.limiter.acquire(priority)
+                try:
+                    result = fn(*args)
+                except BaseException as e:
+                    self.limiter.release(token, throttled=is_throttle_error(e))
+                    raise
+                self.limiter.release(token)
+                return result
+
+    def run_bulk(self, name, symbols, fn, progress=None):
+        """
+        Runs fn(symbol) for every symbol as background work, recording progress in the ledger.
+
+        If a run with this name was interrupted, only the symbols it had not finished
+        are fetched; results from before the interruption are read back from the ledger.
+
+        Args:
+            name (str): Identifies the run (e.g. 'fundamentals').
+            symbols (list): The symbols to fetch.
+            fn (callable): Fetches one symbol; its result must be JSON-serializable.
+            progress (callable): Optional progress(done, total) callback, called from this thread.
+
+        Returns:
+            dict: Mapping of symbol to result for every symbol that succeeded.
+        """
+        init_fetch_ledger()
+        symbols = list(dict.fromkeys(symbols))
+        pending = _open_run(name, symbols)
+        budget = RetryBudget(max(MIN_RETRY_BUDGET, int(len(pending) * RETRY_BUDGET_RATIO)))
+
+        done = len(symbols) - len(pending)
+        with ThreadPoolExecutor(max_workers=self.limiter.maximum) as pool:
+            futures = {pool.submit(self.call, fn, symbol, priority=BACKGROUND, budget=budget): symbol
+                       for symbol in pending}
+            for future in as_completed(futures):
+                # Recorded from this thread only, so the ledger has a single writer
+                _record_item(name, futures[future], future)
+                done += 1
+                if progress:
+                    progress(done, len(symbols))
+
+        FetchRun.update(finished_at=datetime.utcnow()).where(FetchRun.name == name).execute()
+        query = FetchItem.select().where((FetchItem.run == name) & (FetchItem.status == 'done'))
+        requested = set(symbols)
+        return {item.symbol: json.loads(item.result) for item in query if item.symbol in requested}
+
+
+# --- Progress Ledger ---
+
+ledger_db = SqliteDatabase(None)
+
+
+class LedgerModel(Model):
+    class Meta:
+        database = ledger_db
+
+
+class FetchRun(LedgerModel):
+    name = CharField(primary_key=True)
+    started_at = DateTimeField(default=datetime.utcnow)
+    finished_at = DateTimeField(null=True)
+
+
+class FetchItem(LedgerModel):
+    run = CharField()
+    symbol = CharField()
+    status = CharField(default='pending', index=True)  # 'pending', 'done' or 'failed'
+    result = TextField(null=True)
+    error = TextField(null=True)
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    class Meta:
+        primary_key = CompositeKey('run', 'symbol')
+
+
+def init_fetch_ledger(path=None):
+    """
+    Opens the progress ledger, creating its tables on first use.
+
+    Args:
+        path (str): SQLite file to use. Defaults to fetch_ledger.db in the app's data directory.
+    """
+    open_database(ledger_db, "fetch_ledger.db", [FetchRun, FetchItem], path)
+
+
+def _open_run(name, symbols):
+    # Resumes an unfinished run with this name, or starts a new one; returns the symbols still to fetch
+    with ledger_db.atomic():
+        run = FetchRun.get_or_none(FetchRun.name == name)
+        if run is None or run.finished_at is not None:
+            FetchItem.delete().where(FetchItem.run == name).execute()
+            FetchRun.insert(name=name, started_at=datetime.utcnow(), finished_at=None).on_conflict_replace().execute()
+        rows = [{'run': name, 'symbol': symbol} for symbol in symbols]
+        # Batched to stay under SQLite's bound-parameter limit
+        for start in range(0, len(rows), 400):
+            FetchItem.insert_many(rows[start:start + 400]).on_conflict_ignore().execute()
+    finished = {item.symbol for item in FetchItem.select(FetchItem.symbol).where(
+        (FetchItem.run == name) & (FetchItem.status == 'done'))}
+    return [symbol for symbol in symbols if symbol not in finished]
+
+
+def _record_item(name, symbol, future):
+    try:
+        values = {'status': 'done', 'result': json.dumps(future.result()), 'error': None}
+    except Exception as e:
+        values = {'status': 'failed', 'result': None, 'error': str(e)}
+    values['updated_at'] = datetime.utcnow()
+    FetchItem.update(**values).where((FetchItem.run == name) & (FetchItem.symbol == symbol)).execute()
+
+
+def get_run_progress(name):
+    """
+    Summarizes the latest run with this name.
+
+    Returns:
+        dict: Counts of 'pending', 'done' and 'failed' symbols, plus 'finished' (bool).
+    """
+    init_fetch_ledger()
+    counts = {'pending': 0, 'done': 0, 'failed': 0}
+    for item in FetchItem.select(FetchItem.status).where(FetchItem.run == name):
+        counts[item.status] += 1
+    run = FetchRun.get_or_none(FetchRun.name == name)
+    counts['finished'] = run is not None and run.finished_at is not None
+    return counts
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Returns the process-wide scheduler shared by interactive fetches and bulk refreshes."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FetchScheduler()
+        return _scheduler
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import pandas as pd
+import pyarrow as pa
+
+from storage import data_path
+
+# Frames live as uncompressed Arrow IPC files; /dev/shm keeps them in RAM and shared by every process
+FRAME_DIR = os.environ.get("FRAME_STORE_DIR") or (
+    os.path.join("/dev/shm", "investa_frames") if os.path.isdir("/dev/shm") else data_path("frames")
+)
+MAX_OPEN_FRAMES = 256  # Memory-mapped views kept open per process
+MAX_FRAME_AGE = 86400  # Files older than this are pruned when new frames are written
+
+_INDEX_COLUMN = "__index__"
+_open_frames = OrderedDict()
+_lock = threading.Lock()
+
+
+def frame_key(*parts):
+    """Builds a frame key from its identifying parts, e.g. frame_key('hist', 'AAPL', '1y')."""
+    return ":".join(str(p) for p in parts)
+
+
+def _frame_path(key):
+    os.makedirs(FRAME_DIR, exist_ok=True)
+    return os.path.join(FRAME_DIR, hashlib.sha1(key.encode()).hexdigest() + ".arrow")
+
+
+def _to_table(df):
+    # from_pandas=False keeps NaN as a float value rather than a null, so columns stay zero-copy on read
+    arrays = [pa.array(df.index)] + [pa.array(df[col].to_numpy(), from_pandas=False) for col in df.columns]
+    names = [_INDEX_COLUMN] + [str(col) for col in df.columns]
+    metadata = {b"index_name": str(df.index.name or "").encode()}
+    return pa.Table.from_arrays(arrays, names=names, metadata=metadata)
+
+
+def _read_view(path, key, signature):
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    index = pd.Index(table.column(_INDEX_COLUMN).to_pandas())
+    index.name = table.schema.metadata.get(b"index_name", b"").decode() or None
+    # One block per column means no consolidation copy; numeric columns point straight at the mapping
+    view = table.drop_columns([_INDEX_COLUMN]).to_pandas(split_blocks=True)
+    view.index = index
+    view.attrs['frame_key'] = key
+    view.attrs['frame_version'] = f"{signature[0]:x}"
+    return view
+
+
+def put_frame(key, df):
+    """
+    Writes a frame to the store and returns a read-only view of it.
+
+    Args:
+        key (str): The frame key (see frame_key).
+        df (pd.DataFrame): The frame to store; its columns must have string names.
+
+    Returns:
+        pd.DataFrame: A zero-copy, read-only view backed by the stored file.
+    """
+    path = _frame_path(key)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    table = _to_table(df)
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    prune_frames()
+    return get_frame(key)
+
+
+def get_frame(key, max_age=None):
+    """
+    Returns a read-only view of a stored frame.
+
+    Views are memory-mapped once per process and reused while the file is
+    unchanged, so repeated reads cost a stat call rather than a deserialization.
+    Each call gets its own shallow copy over the shared buffers, so adding or
+    renaming columns in one session never changes the frame another session sees.
+
+    Args:
+        key (str): The frame key.
+        max_age (float): Optional maximum age in seconds; older frames count as missing.
+
+    Returns:
+        pd.DataFrame: The view, or None if the frame is missing or too old.
+    """
+    path = _frame_path(key)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if max_age is not None and time.time() - stat.st_mtime > max_age:
+        return None
+
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        entry = _open_frames.get(key)
+        if entry is not None and entry[0] == signature:
+            _open_frames.move_to_end(key)
+            return entry[1].copy(deep=False)
+
+    view = _read_view(path, key, signature)
+    with _lock:
+        _open_frames[key] = (signature, view)
+        _open_frames.move_to_end(key)
+        while len(_open_frames) > MAX_OPEN_FRAMES:
+            _open_frames.popitem(last=False)
+    return view.copy(deep=False)
+
+
+def get_or_create_frame(key, compute, max_age=None):
+    """
+    Returns the stored frame for key, computing and storing it first if needed.
+
+    Args:
+        key (str): The frame key.
+        compute (callable): Produces the DataFrame when it is missing.
+        max_age (float): Optional maximum age in seconds before recomputing.
+
+    Returns:
+        pd.DataFrame: A read-only view of the frame.
+    """
+    view = get_frame(key, max_age)
+    if view is None:
+        view = put_frame(key, compute())
+    return view
+
+
+def prune_frames(max_age=MAX_FRAME_AGE):
+    """Deletes stored frames (and abandoned temporary files) older than max_age seconds."""
+    cutoff = time.time() - max_age
+    for entry in os.scandir(FRAME_DIR):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            continue
@@ -0,0 +1,242 @@
+import logging
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+import yfinance as yf
+
+from discover import download_sp500_stocks
+from fetch_scheduler import get_scheduler
+from shared_cache import get_shared_cache
+from storage import data_path
+
+logger = logging.getLogger(__name__)
+
+# Columnar snapshot of the whole universe; rewritten atomically by the bulk refresh
+SNAPSHOT_PATH = data_path("fundamentals.parquet")
+REFRESH_INTERVAL = float(os.environ.get("FUNDAMENTALS_REFRESH_HOURS", "24")) * 3600
+# Host-wide lease so only one process refreshes; renewed while the refresh makes progress
+REFRESH_LEASE_KEY = "fundamentals:refresh"
+REFRESH_LEASE_SECONDS = 600
+LEASE_RENEW_INTERVAL = 60
+
+# Fields copied from Yahoo Finance's info dict into the snapshot
+NUMERIC_FIELDS = ['marketCap', 'trailingPE', 'forwardPE', 'fiftyTwoWeekHigh', 'fiftyTwoWeekLow',
+                  'dividendYield', 'beta', 'currentPrice']
+SNAPSHOT_SCHEMA = pa.schema(
+    [('symbol', pa.string()), ('company', pa.string()), ('sector', pa.string())]
+    + [(field, pa.float64()) for field in NUMERIC_FIELDS]
+    + [('updated_at', pa.timestamp('s', tz='UTC'))]
+)
+
+MARKET_CAP_BANDS = {
+    "Mega (> $200B)": (200e9, None),
+    "Large ($10B - $200B)": (10e9, 200e9),
+    "Mid ($2B - $10B)": (2e9, 10e9),
+    "Small (< $2B)": (None, 2e9),
+}
+
+
+# --- Bulk Refresh ---
+
+def fetch_fundamentals(symbol):
+    """
+    Fetches the snapshot fields for one symbol from Yahoo Finance.
+
+    Args:
+        symbol (str): The stock ticker symbol.
+
+    Returns:
+        dict: The numeric fields (None where Yahoo has no value). Raises on network errors.
+    """
+    info = yf.Ticker(symbol).info or {}
+    row = {}
+    for field in NUMERIC_FIELDS:
+        value = info.get(field)
+        row[field] = float(value) if isinstance(value, (int, float)) else None
+    return row
+
+
+def write_snapshot(snapshot):
+    """
+    Writes the snapshot to Parquet, replacing the previous file atomically.
+
+    Args:
+        snapshot (pd.DataFrame): One row per symbol with the SNAPSHOT_SCHEMA columns.
+    """
+    table = pa.Table.from_pandas(snapshot, schema=SNAPSHOT_SCHEMA, preserve_index=False)
+    tmp_path = f"{SNAPSHOT_PATH}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path)
+    # Readers always see either the old or the new snapshot, never a partial file
+    os.replace(tmp_path, SNAPSHOT_PATH)
+
+
+def refresh_fundamentals(universe=None, progress=None):
+    """
+    Fetches fundamentals for every symbol in the universe and rewrites the snapshot.
+
+    Requests go through the adaptive fetch scheduler as background work, and an
+    interrupted refresh resumes from its progress ledger. Symbols that fail keep
+    their previous row, so a partial outage never empties the table.
+
+    Args:
+        universe (dict): Mapping of sector to {'symbol', 'description'} dicts; defaults to the S&P 500.
+        progress (callable): Optional progress(done, total) callback.
+
+    Returns:
+        int: The number of symbols refreshed.
+    """
+    universe = universe or download_sp500_stocks()
+    listing = [(stock['symbol'], stock['description'], sector)
+               for sector, stocks in universe.items() for stock in stocks]
+
+    results = get_scheduler().run_bulk(
+        'fundamentals', [symbol for symbol, _, _ in listing], fetch_fundamentals, progress=progress)
+
+    previous = load_fundamentals()
+    now = pd.Timestamp.now(tz='UTC').floor('s')
+    rows = []
+    for symbol, company, sector in listing:
+        fields = results.get(symbol)
+        if fields is not None:
+            rows.append({'symbol': symbol, 'company': company, 'sector': sector, **fields, 'updated_at': now})
+        elif symbol in previous.index:
+            rows.append({**previous.loc[symbol].to_dict(), 'symbol': symbol})
+    if not rows:
+        return 0
+    write_snapshot(pd.DataFrame(rows, columns=SNAPSHOT_SCHEMA.names))
+    return len(results)
+
+
+def snapshot_age():
+    """Returns the age of the snapshot file in seconds, or None if there is none."""
+    try:
+        return time.time() - os.path.getmtime(SNAPSHOT_PATH)
+    except OSError:
+        return None
+
+
+def _refresh_with_lease(cache):
+    # Holds the lease for the whole refresh, renewing it as symbols complete
+    last_renewal = [time.time()]
+
+    def renew(done, total):
+        if time.time() - last_renewal[0] > LEASE_RENEW_INTERVAL:
+            cache.renew_lease(REFRESH_LEASE_KEY, REFRESH_LEASE_SECONDS)
+            last_renewal[0] = time.time()
+
+    try:
+        # Another process may have finished a refresh just before the lease was free
+        age = snapshot_age()
+        if age is None or age > REFRESH_INTERVAL:
+            refresh_fundamentals(progress=renew)
+    finally:
+        cache.release_lease(REFRESH_LEASE_KEY)
+
+
+def _refresh_loop():
+    cache = get_shared_cache()
+    while True:
+        age = snapshot_age()
+        try:
+            if (age is None or age > REFRESH_INTERVAL) and cache.acquire_lease(REFRESH_LEASE_KEY, REFRESH_LEASE_SECONDS):
+                _refresh_with_lease(cache)
+        except Exception:
+            logger.exception("Fundamentals refresh failed")
+        time.sleep(600)
+
+
+@st.cache_resource
+def start_fundamentals_refresher():
+    """
+    Starts the scheduled bulk refresh thread once per process.
+
+    The snapshot is refreshed when it is older than REFRESH_INTERVAL; a lease in the
+    shared cache keeps concurrent processes from refreshing it at the same time.
+    Call it from the views that read the snapshot rather than at start-up, so the
+    bulk download only runs once someone uses the screener.
+    """
+    thread = threading.Thread(target=_refresh_loop, name="fundamentals-refresh", daemon=True)
+    thread.start()
+    return thread
+
+
+# --- Queries ---
+
+@st.cache_data(show_spinner=False)
+def _read_snapshot(path, mtime):
+    # 'mtime' is only part of the cache key, so each new snapshot is read once per process
+    return pd.read_parquet(path).set_index('symbol')
+
+
+def load_fundamentals():
+    """
+    Loads the latest fundamentals snapshot.
+
+    Returns:
+        pd.DataFrame: One row per symbol, indexed by symbol; empty if no snapshot exists yet.
+    """
+    try:
+        mtime = os.path.getmtime(SNAPSHOT_PATH)
+    except OSError:
+        return pd.DataFrame(columns=SNAPSHOT_SCHEMA.names).set_index('symbol')
+    return _read_snapshot(SNAPSHOT_PATH, mtime)
+
+
+def screen_fundamentals(snapshot, max_pe=None, min_dividend_yield=None, market_cap_band=None, sectors=None):
+    """
+    Filters the snapshot with vectorized column comparisons.
+
+    Rows missing a filtered value are excluded by that filter (NaN never compares true).
+
+    Args:
+        snapshot (pd.DataFrame): Table returned by load_fundamentals.
+        max_pe (float): Keep trailing P/E below this value (positive P/E only).
+        min_dividend_yield (float): Keep dividend yield above this value, in the units of the
+                                    'dividendYield' column (a fraction, as shown on the dashboard).
+        market_cap_band (str): A key of MARKET_CAP_BANDS.
+        sectors (list): GICS sectors to keep.
+
+    Returns:
+        pd.DataFrame: The matching rows, largest market cap first.
+    """
+    mask = np.ones(len(snapshot), dtype=bool)
+    if max_pe is not None:
+        pe = snapshot['trailingPE'].to_numpy(dtype=float)
+        mask &= (pe > 0) & (pe < max_pe)
+    if min_dividend_yield is not None:
+        mask &= snapshot['dividendYield'].to_numpy(dtype=float) > min_dividend_yield
+    if market_cap_band:
+        low, high = MARKET_CAP_BANDS[market_cap_band]
+        market_cap = snapshot['marketCap'].to_numpy(dtype=float)
+        if low is not None:
+            mask &= market_cap >= low
+        if high is not None:
+            mask &= market_cap < high
+    if sectors:
+        mask &= snapshot['sector'].isin(sectors).to_numpy()
+    return snapshot[mask].sort_values('marketCap', ascending=False)
+
+
+def get_fundamentals(ticker, fallback=None):
+    """
+    Returns one symbol's fundamentals from the snapshot.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        fallback (dict): Values (e.g. a Yahoo Finance info dict) used for symbols or
+                         fields the snapshot does not have.
+
+    Returns:
+        dict: The snapshot fields for the symbol, completed from the fallback.
+    """
+    values = dict(fallback or {})
+    snapshot = load_fundamentals()
+    if ticker in snapshot.index:
+        row = snapshot.loc[ticker]
+        values.update({field: row[field] for field in NUMERIC_FIELDS if pd.notna(row[field])})
+    return values
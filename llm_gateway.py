@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+import google.generativeai as genai
+from google.ai import generativelanguage as glm
+from google.api_core import exceptions as google_exceptions
+from tenacity import Retrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+# Shared budget for every Gemini call made by this server process (all sessions)
+REQUESTS_PER_MINUTE = float(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", "10"))
+BURST = int(os.environ.get("GEMINI_BURST", "3"))
+MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "4"))
+QUOTA_RETRIES = int(os.environ.get("GEMINI_QUOTA_RETRIES", "4"))
+
+# 429 / RESOURCE_EXHAUSTED responses mean "wait", not "fail"
+QUOTA_ERRORS = (google_exceptions.TooManyRequests,)
+
+
+class TokenBucket:
+    """
+    A blocking token bucket. Callers that find it empty reserve a future token
+    and sleep until it is due, so bursts are queued in arrival order instead of rejected.
+    """
+
+    def __init__(self, rate_per_minute, capacity):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes one token, sleeping until it is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # A negative balance is a queue of callers already waiting for refills
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class LLMGateway:
+    """
+    Funnels LLM calls through one rate limiter and concurrency limit, and coalesces
+    identical in-flight requests so only one upstream call is made for all of them.
+    """
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, burst=BURST,
+                 max_concurrency=MAX_CONCURRENCY, quota_retries=QUOTA_RETRIES):
+        self.bucket = TokenBucket(requests_per_minute, burst)
+        self.concurrency = threading.BoundedSemaphore(max_concurrency)
+        self.quota_retries = quota_retries
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def call(self, key, fn):
+        """
+        Runs fn() once per key at a time; concurrent callers with the same key share its result.
+
+        Args:
+            key (str): Identifies the request; build it with request_key from all inputs.
+            fn (callable): Makes the upstream call and returns its result.
+
+        Returns:
+            The value returned by fn (or raises the exception it raised).
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = self._run_limited(fn)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _run_limited(self, fn):
+        retrying = Retrying(
+            retry=retry_if_exception_type(QUOTA_ERRORS),
+            wait=wait_exponential(multiplier=2, min=2, max=60),
+            stop=stop_after_attempt(self.quota_retries + 1),
+            reraise=True
+        )
+        for attempt in retrying:
+            with attempt:
+                self.bucket.acquire()
+                with self.concurrency:
+                    return fn()
+
+
+def request_key(*parts):
+    """
+    Builds a stable coalescing key from a request's inputs.
+
+    Args:
+        *parts: JSON-serializable request inputs (model, instructions, prompt, history, ...).
+
+    Returns:
+        str: A SHA-256 hex digest of the inputs.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def key_fingerprint(api_key):
+    """Returns a short, non-reversible tag for an API key so results are never shared across keys."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def gemini_model(api_key, model_name, system_instruction):
+    """
+    Builds a Gemini model bound to one user's API key.
+
+    genai.configure sets a single key for the whole process, and a model only
+    picks up that default client when it first makes a call, which here happens
+    later on a worker thread. With several sessions running at once, a request
+    could then go out under another user's key. Each key gets its own client
+    instead, and the model is bound to it up front.
+
+    Args:
+        api_key (str): The user's Google Gemini API key.
+        model_name (str): The Gemini model to use.
+        system_instruction (str): The model's system instruction.
+
+    Returns:
+        genai.GenerativeModel: The model, with calls authenticated by api_key.
+    """
+    fingerprint = key_fingerprint(api_key)
+    with _clients_lock:
+        client = _clients.get(fingerprint)
+        if client is None:
+            client = _clients[fingerprint] = glm.GenerativeServiceClient(client_options={'api_key': api_key})
+    model = genai.GenerativeModel(model_name=model_name, system_instruction=system_instruction)
+    # The SDK only falls back to the process-wide default client when this is unset
+    model._client = client
+    return model
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Returns the process-wide gateway shared by the adviser and the chatbot."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
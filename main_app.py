@@ -4,15 +4,25 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import json
-import os
+from plotly.colors import qualitative
 
 # Import functions from our other files
-from data_fetcher import get_stock_data, get_news_data
-from analyzer import calculate_technical_indicators, analyze_sentiment
+from data_fetcher import get_stock_data, get_price_history
+from analyzer import get_indicator_frame
+from news_store import ingest_news, get_recent_articles, get_stored_sentiment, get_daily_sentiment
 from adviser import generate_advice, generate_gemini_report
 from chatbot import get_chatbot_response
-from discover import discover_stocks_yfinance
+from model_router import get_latency_stats
+from chat_context import build_stock_digest
+from risk_simulator import simulate_risk
+from event_study import SENTIMENT_LABELS, study_ticker_news
+from fundamentals import MARKET_CAP_BANDS, start_fundamentals_refresher, load_fundamentals, screen_fundamentals, get_fundamentals
+from alerts import RULE_TYPES, start_alert_evaluator, get_watchlist, set_watchlist, get_recent_alerts, mark_alerts_seen
+from discover import discover_stocks_yfinance, stocks_to_frame, filter_stocks, load_raw_stock_list
+from portfolio import parse_holdings, load_portfolio_model
+from similarity import get_similarity_index, build_similarity_index, refresh_similarity_index
+from comparison import MAX_TICKERS, parse_tickers, align_prices, compare_prices, downsample
+from profiler import start_rerun_profiler
 
 # --- Page Configuration and CSS ---
 st.set_page_config(
@@ -22,6 +32,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Opt-in sampling profile of this rerun: add ?profile=1 to the URL, or set INVESTA_PROFILE=1 for every rerun
+profile_view = st.session_state.get('main_nav_selector', "Analyzer")
+start_rerun_profiler(
+    ticker=st.session_state.get('ticker_input'),
+    page=st.session_state.get('navigation', "Dashboard") if profile_view == "Analyzer" else profile_view
+)
+
 # Greatly enhanced CSS for a professional, modern look with more color
 st.markdown("""
 <style>
@@ -217,6 +234,17 @@ if 'main_view' not in st.session_state:
     st.session_state.main_view = "Analyzer"
 if 'discovered_stocks' not in st.session_state:
     st.session_state.discovered_stocks = {}
+if 'portfolio_text' not in st.session_state:
+    st.session_state.portfolio_text = "\n".join(f"{t} 1" for t in FEATURED_STOCKS["Big Tech"])
+if 'portfolio_holdings' not in st.session_state:
+    st.session_state.portfolio_holdings = {}
+if 'compare_text' not in st.session_state:
+    st.session_state.compare_text = ", ".join(FEATURED_STOCKS["Big Tech"] + FEATURED_STOCKS["BFSI"])
+if 'compare_tickers' not in st.session_state:
+    st.session_state.compare_tickers = []
+
+# Background watchlist evaluation (one thread per process, one active evaluator per host)
+start_alert_evaluator()
 
 # --- Callback functions ---
 def set_ticker(ticker):
@@ -227,6 +255,14 @@ def set_ticker_and_switch_view(ticker):
     """Callback to set ticker and switch back to the analyzer view."""
     st.session_state.ticker_input = ticker
     st.session_state.main_view = "Analyzer"
+    st.session_state.main_nav_selector = "Analyzer"
+
+def on_discover_select():
+    """Callback for a row selection in the Discover table."""
+    rows = st.session_state.discover_table.selection.rows
+    visible = st.session_state.get('discover_visible_symbols', [])
+    if rows and rows[0] < len(visible):
+        set_ticker_and_switch_view(visible[rows[0]])
 
 # --- UI Layout ---
 with st.sidebar:
@@ -234,7 +270,7 @@ with st.sidebar:
     
     st.session_state.main_view = st.radio(
         "Main Menu",
-        ["Analyzer", "Discover"],
+        ["Analyzer", "Discover", "Portfolio", "Compare"],
         key="main_nav_selector",
         horizontal=True,
     )
@@ -279,6 +315,57 @@ with st.sidebar:
         if st.button("Load S&P 500 Stocks"):
             st.session_state.discovered_stocks = discover_stocks_yfinance()
 
+    # --- PORTFOLIO VIEW SIDEBAR ---
+    elif st.session_state.main_view == "Portfolio":
+        st.markdown("### Portfolio Analytics")
+        st.session_state.portfolio_text = st.text_area(
+            "Holdings",
+            value=st.session_state.portfolio_text,
+            height=220,
+            help="One holding per line: TICKER WEIGHT (e.g. 'AAPL 25'). Weights are normalized."
+        )
+        portfolio_period = st.selectbox("Estimation Window", ["6mo", "1y", "2y", "5y"], index=1)
+        var_confidence = st.select_slider("VaR Confidence", options=[0.90, 0.95, 0.99], value=0.95, format_func=lambda c: f"{c:.0%}")
+        var_horizon = st.number_input("VaR Horizon (trading days)", min_value=1, max_value=60, value=1)
+        if st.button("Build Portfolio"):
+            st.session_state.portfolio_holdings = parse_holdings(st.session_state.portfolio_text)
+
+    # --- COMPARE VIEW SIDEBAR ---
+    elif st.session_state.main_view == "Compare":
+        st.markdown("### Compare Stocks")
+        st.session_state.compare_text = st.text_area(
+            "Tickers",
+            value=st.session_state.compare_text,
+            height=120,
+            help=f"Separate tickers with commas or spaces (up to {MAX_TICKERS})."
+        )
+        compare_period = st.selectbox("Period", ["6mo", "1y", "2y", "5y", "10y"], index=1)
+        compare_vol_window = st.slider("Volatility Window (trading days)", min_value=5, max_value=63, value=21)
+        if st.button("Compare"):
+            st.session_state.compare_tickers = parse_tickers(st.session_state.compare_text)
+
+    # --- ALERTS (all views) ---
+    st.markdown("---")
+    st.markdown("### 🔔 Alerts")
+    recent_alerts = get_recent_alerts(unseen_only=True, limit=10)
+    if not recent_alerts:
+        st.caption("No new alerts for your watchlist.")
+    for alert in recent_alerts:
+        st.warning(f"**{alert.ticker}** ({alert.bar_date:%b %d}): {alert.message}")
+    if recent_alerts:
+        st.button("Mark All as Read", on_click=mark_alerts_seen)
+
+    with st.expander("Manage Watchlist"):
+        watchlist = get_watchlist()
+        watch_text = st.text_input("Tickers (comma-separated)", value=", ".join(watchlist))
+        current_rules = sorted({r for rules in watchlist.values() for r in rules if r in RULE_TYPES}) or list(RULE_TYPES)
+        watch_rules = st.multiselect("Alert Rules", list(RULE_TYPES), default=current_rules, format_func=RULE_TYPES.get)
+        if 'sentiment_swing' not in RULE_TYPES:
+            st.caption("Sentiment swing alerts need a server-side NewsAPI key (set NEWSAPI_KEY).")
+        if st.button("Save Watchlist"):
+            set_watchlist(watch_text.split(','), watch_rules)
+            st.success("Watchlist saved. New tickers are evaluated within a minute.")
+
 # --- App Logic (for Analyzer) ---
 if st.session_state.main_view == "Analyzer":
     if 'analyze_button' in locals() and analyze_button:
@@ -289,10 +376,14 @@ if st.session_state.main_view == "Analyzer":
                 stock_info, stock_hist = get_stock_data(ticker_input)
 
                 if stock_info and not stock_hist.empty:
-                    news_articles = get_news_data(ticker_input, news_api_key)
-                    hist_with_indicators = calculate_technical_indicators(stock_hist)
-                    avg_sentiment = analyze_sentiment(news_articles)
-                    advice, _, style_class = generate_advice(hist_with_indicators, avg_sentiment, risk_tolerance)
+                    # Only articles newer than the stored cursor are fetched and scored
+                    ingest_news(ticker_input, news_api_key)
+                    news_articles = get_recent_articles(ticker_input)
+                    # Indicators only for the charted year (plus warm-up); the simulation resamples the full history
+                    hist_with_indicators = get_indicator_frame(stock_hist, display_bars=365)
+                    avg_sentiment = get_stored_sentiment(news_articles)
+                    risk_profile = simulate_risk(stock_hist['Close'])
+                    advice, _, style_class = generate_advice(hist_with_indicators, avg_sentiment, risk_tolerance, risk_profile)
                     gemini_report = generate_gemini_report(
                         stock_info, hist_with_indicators, avg_sentiment, risk_tolerance, gemini_api_key
                     )
@@ -301,10 +392,14 @@ if st.session_state.main_view == "Analyzer":
                     st.session_state.stock_info = stock_info
                     st.session_state.hist_with_indicators = hist_with_indicators
                     st.session_state.news_articles = news_articles
+                    st.session_state.daily_sentiment = get_daily_sentiment(ticker_input)
+                    st.session_state.event_study = study_ticker_news(ticker_input)
                     st.session_state.advice = advice
                     st.session_state.style_class = style_class
+                    st.session_state.risk_profile = risk_profile
                     st.session_state.gemini_report = gemini_report
                     st.session_state.current_ticker = ticker_input
+                    st.session_state.stock_digest = build_stock_digest(ticker_input, hist_with_indicators, stock_info)
                     st.session_state.page = "Dashboard"
 
                     st.session_state.messages = [{
@@ -335,14 +430,21 @@ if st.session_state.main_view == "Analyzer":
                     <div class="rec-icon">{rec_icon}</div>
                     <h2>{st.session_state.advice}</h2>
                 </div>''', unsafe_allow_html=True)
+                risk_profile = st.session_state.risk_profile
+                if risk_profile is not None:
+                    st.markdown("### Simulated Risk")
+                    risk_col1, risk_col2 = st.columns(2)
+                    risk_col1.metric(f"Chance of >10% Loss ({risk_profile['horizon_days']}d)", f"{risk_profile['severe_loss_probability']:.0%}")
+                    risk_col2.metric("95th Pct. Drawdown", f"{risk_profile['drawdown_95']:.0%}")
+                    st.caption(f"{risk_profile['n_paths']:,} block-bootstrapped paths from the last year of daily returns.")
                 st.info("Navigate to the **Detailed AI Report** for a full breakdown.", icon="ℹ️")
 
             with col2:
                 st.markdown("### Key Information")
-                info = st.session_state.stock_info
+                info = get_fundamentals(st.session_state.current_ticker, fallback=st.session_state.stock_info)
                 st.markdown(f"""
                 <div class="card">
-                    <div class="metric-card"><span class="icon">💼</span><div class="text"><h4>Market Cap</h4><p>${info.get("marketCap", 0):,}</p></div></div>
+                    <div class="metric-card"><span class="icon">💼</span><div class="text"><h4>Market Cap</h4><p>${info.get("marketCap", 0):,.0f}</p></div></div>
                     <div class="metric-card"><span class="icon">⚖️</span><div class="text"><h4>P/E Ratio</h4><p>{info.get("trailingPE", 0):.2f}</p></div></div>
                     <div class="metric-card"><span class="icon">🔼</span><div class="text"><h4>52-Wk High</h4><p>${info.get("fiftyTwoWeekHigh", 0):.2f}</p></div></div>
                     <div class="metric-card"><span class="icon">🔽</span><div class="text"><h4>52-Wk Low</h4><p>${info.get("fiftyTwoWeekLow", 0):.2f}</p></div></div>
@@ -357,7 +459,7 @@ if st.session_state.main_view == "Analyzer":
                 st.markdown("### Advanced Charting")
                 df = st.session_state.hist_with_indicators.tail(365)
 
-                tab1, tab2 = st.tabs(["Price Action (Candlestick)", "Momentum Indicators (RSI, MACD)"])
+                tab1, tab2, tab3 = st.tabs(["Price Action (Candlestick)", "Momentum Indicators (RSI, MACD)", "News Sentiment"])
 
                 with tab1:
                     fig = make_subplots(rows=2, cols=1, shared_xaxes=True,
@@ -387,6 +489,47 @@ if st.session_state.main_view == "Analyzer":
                                        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
                     st.plotly_chart(fig2, use_container_width=True)
 
+                with tab3:
+                    daily = st.session_state.daily_sentiment
+                    if daily.empty:
+                        st.info("No stored news sentiment for this ticker yet.")
+                    else:
+                        daily = daily[daily.index >= df.index.min().tz_localize(None).normalize()]
+                        fig3 = make_subplots(specs=[[{"secondary_y": True}]])
+                        fig3.add_trace(go.Scatter(x=df.index, y=df['Close'], name='Close', line=dict(color='#0072B5')), secondary_y=False)
+                        fig3.add_trace(go.Bar(x=daily.index, y=daily['sentiment'], name='Daily Sentiment',
+                                              marker_color=['#006A4E' if v >= 0 else '#A30000' for v in daily['sentiment']],
+                                              customdata=daily['articles'], hovertemplate='%{y:.2f} (%{customdata} articles)'),
+                                       secondary_y=True)
+                        fig3.update_yaxes(title_text="Price", secondary_y=False)
+                        fig3.update_yaxes(title_text="Sentiment", range=[-1, 1], secondary_y=True)
+                        fig3.update_layout(showlegend=True, height=600,
+                                           legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+                        st.plotly_chart(fig3, use_container_width=True)
+
+                    st.markdown("#### Does News Sentiment Predict Returns?")
+                    study = st.session_state.get('event_study')
+                    if study is None:
+                        st.info("Not enough stored articles yet to measure how this stock reacts to news. "
+                                "The study improves as more news is ingested over time.")
+                    else:
+                        summary = study['summary']
+                        fig4 = go.Figure()
+                        bucket_colors = dict(zip(SENTIMENT_LABELS, ['#A30000', '#E06666', '#999999', '#6AA84F', '#006A4E']))
+                        for bucket, rows in summary.groupby('bucket', observed=True, sort=True):
+                            fig4.add_trace(go.Bar(x=rows['window'].astype(str), y=rows['mean_car'], name=bucket,
+                                                  marker_color=bucket_colors[bucket], customdata=rows[['events', 't_stat']],
+                                                  hovertemplate='%{y:.2%} over %{customdata[0]} events (t = %{customdata[1]:.2f})'))
+                        fig4.update_layout(barmode='group', height=400, yaxis_tickformat='.1%',
+                                           xaxis_title="Window (trading days around the news)",
+                                           yaxis_title="Mean abnormal return",
+                                           legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+                        st.plotly_chart(fig4, use_container_width=True)
+                        ic = ", ".join(f"{window} {value:+.2f}" for window, value in study['information_coefficient'].items())
+                        st.caption(f"{len(study['events'])} news days, returns measured against SPY. "
+                                   f"Correlation of sentiment with the abnormal return by window: {ic}. "
+                                   f"|t| above 2 suggests an effect beyond noise.")
+
             with news_col:
                 st.markdown("### Recent News & Sentiment")
                 with st.container():
@@ -398,12 +541,48 @@ if st.session_state.main_view == "Analyzer":
                             st.markdown(f"""<div class="news-article"><p class="news-title"><a href="{article['url']}" target="_blank">{article['title']}</a></p><p class="news-source">{article['source']['name']} - {pd.to_datetime(article['publishedAt']).strftime('%Y-%m-%d')}</p></div>""", unsafe_allow_html=True)
                     st.markdown('</div>', unsafe_allow_html=True)
 
+            st.markdown("---")
+            st.markdown("### Stocks That Move Alike")
+            similarity_index = get_similarity_index()['index']
+            if similarity_index is None:
+                st.info("Build the similarity index once to compare this stock's daily returns against the whole S&P 500.")
+                if st.button("Build Similarity Index"):
+                    universe = st.session_state.discovered_stocks or discover_stocks_yfinance()
+                    symbols = [stock['symbol'] for stocks in universe.values() for stock in stocks]
+                    with st.spinner(f"Building correlation index over {len(symbols)} stocks..."):
+                        build_similarity_index(symbols)
+                    st.rerun()
+            else:
+                similar = similarity_index.most_similar(st.session_state.current_ticker, k=10)
+                if similar.empty:
+                    st.info(f"{st.session_state.current_ticker} is not part of the indexed universe.")
+                else:
+                    st.dataframe(
+                        pd.DataFrame({'Symbol': similar.index, 'Correlation': similar.values}),
+                        column_config={'Correlation': st.column_config.ProgressColumn(format="%.2f", min_value=-1, max_value=1)},
+                        hide_index=True,
+                        use_container_width=True
+                    )
+                st.caption(f"Correlation of daily returns over the last {similarity_index.count} trading days, "
+                           f"as of {similarity_index.last_date:%Y-%m-%d}.")
+                if st.button("Update Index with New Bars"):
+                    with st.spinner("Applying new bars..."):
+                        applied = refresh_similarity_index(similarity_index)
+                    st.success(f"Applied {applied} new trading day(s).")
+
         # --- DETAILED REPORT PAGE ---
         elif st.session_state.page == "Detailed AI Report":
             st.title(f"AI-Generated Report for {st.session_state.current_ticker}")
             st.markdown("---")
             st.markdown("### In-Depth Analysis by Gemini")
             st.markdown(f'<div class="card report-card">{st.session_state.gemini_report}</div>', unsafe_allow_html=True)
+            with st.expander("Model Latency (last 24 hours)"):
+                latency_stats = get_latency_stats()
+                if latency_stats.empty:
+                    st.caption("No Gemini calls recorded yet.")
+                else:
+                    st.dataframe(latency_stats.style.format({'p50 (s)': '{:.1f}', 'p95 (s)': '{:.1f}', 'Max (s)': '{:.1f}',
+                                                             'Missed Deadline': '{:.0%}'}), hide_index=True)
 
         # --- CHATBOT PAGE ---
         elif st.session_state.page == "Chatbot":
@@ -418,9 +597,10 @@ if st.session_state.main_view == "Analyzer":
                 with st.spinner("InvestaBot is thinking..."):
                     response = get_chatbot_response(
                         api_key=gemini_api_key,
-                        chat_history=st.session_state.messages,
+                        chat_history=st.session_state.messages[:-1],
                         user_prompt=prompt,
-                        stock_ticker=st.session_state.current_ticker
+                        stock_ticker=st.session_state.current_ticker,
+                        stock_digest=st.session_state.stock_digest
                     )
                     with st.chat_message("assistant"):
                         st.markdown(response)
@@ -436,26 +616,70 @@ if st.session_state.main_view == "Analyzer":
 # --- DISCOVER VIEW ---
 elif st.session_state.main_view == "Discover":
     st.title("🔎 Discover S&P 500 Stocks")
-    st.markdown("Explore stocks from the S&P 500, categorized by sector. Click any stock to switch to the Analyzer.")
+    # The screener reads the fundamentals snapshot; its scheduled refresh starts with the first visit
+    start_fundamentals_refresher()
+    st.markdown("Explore stocks from the S&P 500, categorized by sector. Select any stock to switch to the Analyzer.")
     st.markdown("---")
 
     if st.session_state.discovered_stocks:
-        for sector, stocks in st.session_state.discovered_stocks.items():
-            with st.expander(f"**{sector}** ({len(stocks)} stocks)"):
-                cols = st.columns(3)
-                for i, stock in enumerate(stocks):
-                    button_label = f"**{stock['symbol']}**: {stock['description']}"
-                    if cols[i % 3].button(button_label, key=stock['symbol'], use_container_width=True):
-                        set_ticker_and_switch_view(stock['symbol'])
-                        st.rerun()
-        
+        stocks_df = stocks_to_frame(st.session_state.discovered_stocks)
+        sector_counts = stocks_df['Sector'].value_counts().sort_index()
+
+        filter_col, sector_col = st.columns([2, 1])
+        with filter_col:
+            query = st.text_input("Filter by symbol or company", key="discover_filter", placeholder="e.g. NVDA or Bank")
+        with sector_col:
+            sector = st.selectbox(
+                "Sector",
+                [None] + sector_counts.index.tolist(),
+                format_func=lambda s: f"All Sectors ({len(stocks_df)} stocks)" if s is None else f"{s} ({sector_counts[s]} stocks)",
+                key="discover_sector"
+            )
+
+        fundamentals_df = load_fundamentals()
+        with st.expander("Fundamentals Screener"):
+            if fundamentals_df.empty:
+                st.info("The fundamentals snapshot is still being built in the background. Check back in a few minutes.")
+            pe_col, yield_col, cap_col = st.columns(3)
+            with pe_col:
+                max_pe = st.number_input("Max P/E Ratio", min_value=0.0, value=0.0, step=1.0, help="0 means no limit.")
+            with yield_col:
+                min_yield = st.number_input("Min Dividend Yield (%)", min_value=0.0, value=0.0, step=0.5, help="0 means no limit.")
+            with cap_col:
+                cap_band = st.selectbox("Market Cap", [None] + list(MARKET_CAP_BANDS), format_func=lambda b: "Any" if b is None else b)
+
+        # Only the selected sector/filter is sent to the browser; the grid itself is virtualized
+        visible_df = filter_stocks(stocks_df, query, sector)
+        if not fundamentals_df.empty:
+            if max_pe or min_yield or cap_band:
+                screened = screen_fundamentals(fundamentals_df, max_pe or None, min_yield / 100 if min_yield else None, cap_band)
+                visible_df = visible_df[visible_df['Symbol'].isin(screened.index)].reset_index(drop=True)
+            visible_df = visible_df.join(fundamentals_df[['marketCap', 'trailingPE', 'dividendYield']], on='Symbol')
+            visible_df['dividendYield'] *= 100
+            visible_df = visible_df.rename(columns={'marketCap': 'Market Cap', 'trailingPE': 'P/E', 'dividendYield': 'Div. Yield (%)'})
+        st.session_state.discover_visible_symbols = visible_df['Symbol'].tolist()
+        st.caption(f"Showing {len(visible_df)} of {len(stocks_df)} stocks. Select a row to open it in the Analyzer.")
+        st.dataframe(
+            visible_df,
+            key="discover_table",
+            on_select=on_discover_select,
+            selection_mode="single-row",
+            column_config={
+                'Market Cap': st.column_config.NumberColumn(format="compact"),
+                'P/E': st.column_config.NumberColumn(format="%.2f"),
+                'Div. Yield (%)': st.column_config.NumberColumn(format="%.2f")
+            },
+            hide_index=True,
+            use_container_width=True,
+            height=560
+        )
+
         st.markdown("---")
         with st.expander("View Raw JSON Data"):
             data_file = 'sp500_categorized.json'
-            if os.path.exists(data_file):
-                with open(data_file, 'r') as f:
-                    raw_data = json.load(f)
-                    st.json(raw_data)
+            raw_data = load_raw_stock_list(data_file)
+            if raw_data is not None:
+                st.json(raw_data, expanded=False)
             else:
                 st.warning(f"The data file '{data_file}' was not found.")
                 st.info("Please run the `generate_stock_list.py` script from your terminal to create it.")
@@ -463,6 +687,140 @@ elif st.session_state.main_view == "Discover":
     else:
         st.info("Click the 'Load S&P 500 Stocks' button in the sidebar to begin.")
 
+# --- PORTFOLIO VIEW ---
+elif st.session_state.main_view == "Portfolio":
+    st.title("📊 Portfolio Analytics")
+    st.markdown("Risk, Value-at-Risk and the efficient frontier for your holdings, estimated from daily returns.")
+    st.markdown("---")
+
+    holdings = st.session_state.portfolio_holdings
+    if not holdings:
+        st.info("Enter your holdings in the sidebar and click 'Build Portfolio' to begin.")
+    else:
+        model = load_portfolio_model(tuple(holdings), portfolio_period)
+        if model is None:
+            st.error("Could not retrieve enough price history for any of the holdings.")
+        else:
+            dropped = [t for t in holdings if t not in model.tickers]
+            if dropped:
+                st.warning(f"Left out for missing or insufficient history: {', '.join(dropped)}")
+
+            weights_col, metrics_col = st.columns([1, 2], gap="large")
+            with weights_col:
+                st.markdown("### Weights")
+                weights_df = pd.DataFrame({'Ticker': model.tickers, 'Weight': [holdings[t] for t in model.tickers]})
+                edited = st.data_editor(
+                    weights_df,
+                    key=f"portfolio_weights_{hash(tuple(model.tickers))}",
+                    disabled=['Ticker'],
+                    hide_index=True,
+                    use_container_width=True
+                )
+                weights = edited['Weight'].fillna(0).to_numpy()
+
+            with metrics_col:
+                st.markdown("### Risk & Return")
+                m = model.metrics(weights, confidence=var_confidence, horizon_days=var_horizon)
+                row1 = st.columns(3)
+                row1[0].metric("Expected Return (ann.)", f"{m['expected_return']:.2%}")
+                row1[1].metric("Volatility (ann.)", f"{m['volatility']:.2%}")
+                row1[2].metric("Sharpe Ratio", f"{m['sharpe']:.2f}")
+                row2 = st.columns(3)
+                row2[0].metric(f"Historical VaR ({var_confidence:.0%}, {var_horizon}d)", f"{m['historical_var']:.2%}")
+                row2[1].metric(f"Parametric VaR ({var_confidence:.0%}, {var_horizon}d)", f"{m['parametric_var']:.2%}")
+                row2[2].metric("Expected Shortfall", f"{m['historical_cvar']:.2%}")
+                st.caption(f"{len(model.tickers)} holdings over {len(model.index)} trading days. "
+                           f"Covariance shrinkage intensity: {model.shrinkage:.2f}.")
+
+            st.markdown("---")
+            st.markdown("### Efficient Frontier")
+            frontier, _ = model.efficient_frontier()
+            min_var = model.metrics(model.min_variance_weights())
+            max_sharpe_weights = model.max_sharpe_weights()
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(x=frontier['volatility'], y=frontier['return'], mode='lines',
+                                     name='Efficient Frontier', line=dict(color='#0072B5', width=2)))
+            fig.add_trace(go.Scatter(x=model.volatility, y=model.mean, mode='markers', name='Holdings',
+                                     text=model.tickers, marker=dict(color='rgba(0, 0, 0, 0.4)', size=7)))
+            fig.add_trace(go.Scatter(x=[min_var['volatility']], y=[min_var['expected_return']], mode='markers',
+                                     name='Minimum Variance', marker=dict(color='green', size=12, symbol='diamond')))
+            if max_sharpe_weights is not None:
+                max_sharpe = model.metrics(max_sharpe_weights)
+                fig.add_trace(go.Scatter(x=[max_sharpe['volatility']], y=[max_sharpe['expected_return']], mode='markers',
+                                         name='Maximum Sharpe', marker=dict(color='orange', size=12, symbol='diamond')))
+            fig.add_trace(go.Scatter(x=[m['volatility']], y=[m['expected_return']], mode='markers',
+                                     name='Your Portfolio', marker=dict(color='red', size=16, symbol='star')))
+            fig.update_layout(height=550, xaxis_title="Volatility (annualized)", yaxis_title="Expected Return (annualized)",
+                              xaxis_tickformat='.0%', yaxis_tickformat='.0%',
+                              legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+            st.plotly_chart(fig, use_container_width=True)
+            st.caption("Frontier portfolios allow short positions; estimates are based on historical returns only.")
+            if max_sharpe_weights is None:
+                st.info("No maximum Sharpe portfolio is shown: the minimum-variance portfolio has no positive expected "
+                        "return over this period, so the frontier has no tangency point at a zero risk-free rate.")
+
+            with st.expander("Correlation Matrix"):
+                corr = model.correlation()
+                heatmap = go.Figure(go.Heatmap(z=corr.values, x=corr.columns, y=corr.index,
+                                               zmin=-1, zmax=1, colorscale='RdBu'))
+                heatmap.update_layout(height=max(400, 12 * len(corr)))
+                st.plotly_chart(heatmap, use_container_width=True)
+
+# --- COMPARE VIEW ---
+elif st.session_state.main_view == "Compare":
+    st.title("⚖️ Compare Stocks")
+    st.markdown("Normalized performance, relative strength and volatility for several stocks on one shared timeline.")
+    st.markdown("---")
+
+    tickers = st.session_state.compare_tickers
+    if not tickers:
+        st.info("Enter a few tickers in the sidebar and click 'Compare' to begin.")
+    else:
+        # One batched download for every ticker, aligned on the dates they all traded
+        prices = align_prices(get_price_history(tuple(tickers), compare_period))
+        missing = [t for t in tickers if t not in prices.columns]
+        if missing:
+            st.warning(f"No price history found for: {', '.join(missing)}")
+        if len(prices) <= compare_vol_window + 1:
+            st.error("Not enough shared price history to compare these stocks. Try a longer period or fewer recent listings.")
+        else:
+            result = compare_prices(prices, vol_window=compare_vol_window)
+            st.markdown("### Summary")
+            st.dataframe(
+                result['stats'],
+                column_config={
+                    'Total Return': st.column_config.NumberColumn(format="percent"),
+                    'Annualized Return': st.column_config.NumberColumn(format="percent"),
+                    'Volatility': st.column_config.NumberColumn(format="percent"),
+                    'Sharpe': st.column_config.NumberColumn(format="%.2f"),
+                    'Max Drawdown': st.column_config.NumberColumn(format="percent"),
+                    'Beta to Group': st.column_config.NumberColumn(format="%.2f"),
+                    'Relative Strength': st.column_config.NumberColumn(format="%.1f")
+                },
+                use_container_width=True
+            )
+
+            st.markdown("### Performance")
+            panels = [('normalized', "Growth of 100"), ('relative_strength', "Relative Strength vs. Group Average"),
+                      ('rolling_volatility', f"{compare_vol_window}-Day Volatility (annualized)")]
+            fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.06,
+                                subplot_titles=[title for _, title in panels])
+            palette = qualitative.Dark24
+            for row, (name, _) in enumerate(panels, start=1):
+                # A few hundred points per line keeps the figure light however long the period
+                series = downsample(result[name])
+                for i, ticker in enumerate(series.columns):
+                    fig.add_trace(go.Scattergl(x=series.index, y=series[ticker], name=ticker, mode='lines',
+                                               legendgroup=ticker, showlegend=row == 1,
+                                               line=dict(color=palette[i % len(palette)], width=1.5)),
+                                  row=row, col=1)
+            fig.update_yaxes(tickformat='.0%', row=3, col=1)
+            fig.update_layout(height=900, hovermode='x unified',
+                              legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+            st.plotly_chart(fig, use_container_width=True)
+            st.caption(f"{len(prices.columns)} stocks over {len(prices)} shared trading days, "
+                       f"from {prices.index[0]:%Y-%m-%d} to {prices.index[-1]:%Y-%m-%d}.")
+
 # --- Footer ---
 st.markdown("---")
 
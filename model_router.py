@@ -0,0 +1,217 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from google.api_core import exceptions as google_exceptions
+from peewee import SqliteDatabase, Model, CharField, FloatField, DateTimeField
+
+from llm_gateway import get_gateway, MAX_CONCURRENCY, QUOTA_ERRORS
+from shared_cache import get_shared_cache
+from storage import open_database
+
+logger = logging.getLogger(__name__)
+
+# Model tiers: 'fast' answers short chat turns and stands in when 'pro' misses its deadline
+MODEL_TIERS = {
+    'fast': os.environ.get("GEMINI_FAST_MODEL", "gemini-2.5-flash"),
+    'pro': os.environ.get("GEMINI_PRO_MODEL", "gemini-2.5-pro"),
+}
+
+# Seconds the user waits on each tier before the next one is tried
+DEADLINES = {
+    'report': {'pro': float(os.environ.get("GEMINI_REPORT_DEADLINE", "60")),
+               'fast': float(os.environ.get("GEMINI_REPORT_FALLBACK_DEADLINE", "25"))},
+    'chat': {'pro': float(os.environ.get("GEMINI_CHAT_DEADLINE", "30")),
+             'fast': float(os.environ.get("GEMINI_CHAT_FALLBACK_DEADLINE", "15"))},
+}
+SHORT_TURN_TOKENS = int(os.environ.get("GEMINI_SHORT_TURN_TOKENS", "150"))  # Chat turns up to this size go to the fast tier
+REQUEST_TIMEOUT_FACTOR = 2.0  # Upstream calls may outlive their deadline, so a late answer is still recorded and cached
+LATENCY_WINDOW_MINUTES = 15  # Recent samples used to decide whether a tier is too slow to try
+MIN_SAMPLES = 5
+REPORT_CACHE_TTL = 24 * 3600
+
+# Errors after which the next tier is tried instead of failing the request
+DEADLINE_ERRORS = (TimeoutError, google_exceptions.DeadlineExceeded)
+FALLBACK_ERRORS = DEADLINE_ERRORS + QUOTA_ERRORS
+
+# Calls run on these threads so the caller can stop waiting at the deadline. A call the caller
+# gave up on keeps its thread until the upstream request times out (deadline x REQUEST_TIMEOUT_FACTOR,
+# plus any quota retries in the gateway), so at most MAX_PENDING_CALLS may be outstanding; past
+# that, new attempts count as missed deadlines instead of queueing behind abandoned ones.
+MAX_PENDING_CALLS = MAX_CONCURRENCY * 4
+_executor = ThreadPoolExecutor(max_workers=MAX_PENDING_CALLS, thread_name_prefix="llm-call")
+_pending_slots = threading.BoundedSemaphore(MAX_PENDING_CALLS)
+atexit.register(_executor.shutdown, wait=False, cancel_futures=True)
+
+
+# --- Routing ---
+
+def route(task, prompt_tokens=0):
+    """
+    Picks the tiers to try for a request, in order.
+
+    Reports go to the pro tier with the fast tier as fallback. Short chat turns go
+    straight to the fast tier; longer ones try pro first unless its recent p95
+    latency is already past the deadline, in which case waiting for it is skipped.
+
+    Args:
+        task (str): 'report' or 'chat'.
+        prompt_tokens (int): Estimated size of the new prompt (chat only).
+
+    Returns:
+        list: Tier names, e.g. ['pro', 'fast'].
+    """
+    if task == 'chat':
+        if prompt_tokens <= SHORT_TURN_TOKENS:
+            return ['fast']
+        p95 = recent_p95(MODEL_TIERS['pro'], task)
+        if p95 is not None and p95 > DEADLINES[task]['pro']:
+            return ['fast']
+    return ['pro', 'fast']
+
+
+def routed_call(task, build, prompt_tokens=0, cache_key=None):
+    """
+    Runs a request on the routed tiers under per-tier deadlines.
+
+    Each attempt goes through the shared LLM gateway on a worker thread; when its
+    deadline passes (or the tier stays rate limited) the next tier is tried. If every
+    tier misses, the last good response stored under cache_key is served instead.
+
+    Args:
+        task (str): 'report' or 'chat'.
+        build (callable): build(model_name, timeout) returning the (key, fn) pair for
+                          get_gateway().call; timeout is the upstream request timeout.
+        prompt_tokens (int): Estimated size of the new prompt, used to route chat turns.
+        cache_key (str): Optional key for keeping the last good response as a fallback.
+
+    Returns:
+        tuple: (text, served_by), where served_by is the model name or 'cache'.
+               Raises TimeoutError (or the last quota error) when nothing could be served.
+    """
+    tiers = route(task, prompt_tokens)
+    last_error = None
+    for tier in tiers:
+        model_name = MODEL_TIERS[tier]
+        deadline = DEADLINES[task][tier]
+        key, fn = build(model_name, deadline * REQUEST_TIMEOUT_FACTOR)
+        started = time.monotonic()
+        if not _pending_slots.acquire(timeout=deadline):
+            last_error = TimeoutError(f"{MAX_PENDING_CALLS} Gemini calls are already outstanding")
+            record_latency(model_name, task, time.monotonic() - started, 'timeout')
+            continue
+        future = _executor.submit(get_gateway().call, key, fn)
+        future.add_done_callback(lambda f, m=model_name, s=started, d=deadline: _on_done(f, task, m, s, d, cache_key))
+        try:
+            return future.result(timeout=max(0.0, deadline - (time.monotonic() - started))), model_name
+        except FALLBACK_ERRORS as e:
+            last_error = e
+
+    if cache_key:
+        hit, cached = get_shared_cache().get(cache_key)
+        if hit:
+            return cached, 'cache'
+    if isinstance(last_error, QUOTA_ERRORS):
+        raise last_error
+    raise TimeoutError(f"No Gemini model answered within its deadline ({', '.join(MODEL_TIERS[t] for t in tiers)} tried)")
+
+
+def _on_done(future, task, model_name, started, deadline, cache_key):
+    # Runs when the upstream call finishes, even if the caller already gave up on it
+    _pending_slots.release()
+    elapsed = time.monotonic() - started
+    error = future.exception()
+    if error is None:
+        outcome = 'ok' if elapsed <= deadline else 'late'
+    elif isinstance(error, DEADLINE_ERRORS):
+        outcome = 'timeout'
+    elif isinstance(error, QUOTA_ERRORS):
+        outcome = 'quota'
+    else:
+        outcome = 'error'
+    try:
+        if error is None and cache_key:
+            get_shared_cache().set(cache_key, future.result(), REPORT_CACHE_TTL)
+        record_latency(model_name, task, elapsed, outcome)
+    except Exception:
+        logger.exception("Could not record model latency")
+
+
+# --- Latency Log ---
+
+metrics_db = SqliteDatabase(None)
+
+
+class ModelLatency(Model):
+    model = CharField()
+    task = CharField()
+    seconds = FloatField()
+    outcome = CharField()  # 'ok', 'late' (answered after the deadline), 'timeout', 'quota' or 'error'
+    created_at = DateTimeField(default=datetime.utcnow, index=True)
+
+    class Meta:
+        database = metrics_db
+
+
+def init_metrics_store(path=None):
+    """
+    Opens the latency log, creating its table on first use.
+
+    Args:
+        path (str): SQLite file to use. Defaults to llm_metrics.db in the app's data directory.
+    """
+    open_database(metrics_db, "llm_metrics.db", [ModelLatency], path)
+
+
+def record_latency(model_name, task, seconds, outcome):
+    """Appends one call's wall-clock latency (queueing included) to the log."""
+    init_metrics_store()
+    ModelLatency.create(model=model_name, task=task, seconds=seconds, outcome=outcome)
+
+
+def recent_p95(model_name, task, minutes=LATENCY_WINDOW_MINUTES):
+    """
+    Returns the 95th percentile latency of a model's recent calls for a task.
+
+    Returns:
+        float: Seconds, or None with fewer than MIN_SAMPLES calls in the window.
+    """
+    init_metrics_store()
+    since = datetime.utcnow() - timedelta(minutes=minutes)
+    seconds = [row.seconds for row in ModelLatency.select(ModelLatency.seconds).where(
+        (ModelLatency.model == model_name) & (ModelLatency.task == task) & (ModelLatency.created_at >= since))]
+    if len(seconds) < MIN_SAMPLES:
+        return None
+    return float(np.percentile(seconds, 95))
+
+
+def get_latency_stats(hours=24):
+    """
+    Summarizes logged latencies per model and task, for tuning the deadlines and routing thresholds.
+
+    Args:
+        hours (int): How far back to look.
+
+    Returns:
+        pd.DataFrame: Calls, p50/p95/max seconds and the share of calls that missed their deadline.
+    """
+    init_metrics_store()
+    since = datetime.utcnow() - timedelta(hours=hours)
+    rows = ModelLatency.select().where(ModelLatency.created_at >= since).dicts()
+    log = pd.DataFrame(list(rows), columns=['model', 'task', 'seconds', 'outcome'])
+    if log.empty:
+        return pd.DataFrame(columns=['Model', 'Task', 'Calls', 'p50 (s)', 'p95 (s)', 'Max (s)', 'Missed Deadline'])
+    log['missed'] = log['outcome'].isin(['late', 'timeout'])
+    grouped = log.groupby(['model', 'task'])
+    return pd.DataFrame({
+        'Calls': grouped.size(),
+        'p50 (s)': grouped['seconds'].median(),
+        'p95 (s)': grouped['seconds'].quantile(0.95),
+        'Max (s)': grouped['seconds'].max(),
+        'Missed Deadline': grouped['missed'].mean(),
+    }).reset_index().rename(columns={'model': 'Model', 'task': 'Task'})
@@ -0,0 +1,357 @@
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+import requests
+import streamlit as st
+from peewee import (
+    SqliteDatabase, Model, CharField, TextField, FloatField, BooleanField,
+    DateTimeField, DateField, IntegerField, CompositeKey, fn
+)
+
+from analyzer import score_articles, recency_weighted_mean
+from data_fetcher import get_news_data, download_news
+from storage import open_database
+
+# Deferred so the path can be chosen at first use (and overridden in scripts)
+db = SqliteDatabase(None)
+
+# NewsAPI's maximum page size; incremental fetches only return articles newer than the cursor
+INCREMENTAL_PAGE_SIZE = 100
+MAX_INCREMENTAL_REQUESTS = 5  # Per ingest; a backlog larger than this is finished by later ingests
+DEDUPE_LOOKBACK = timedelta(days=3)  # Stored stories this close to new articles are checked for syndicated copies
+
+
+class BaseModel(Model):
+    class Meta:
+        database = db
+
+
+class Article(BaseModel):
+    """One news article, keyed by URL, with its sentiment scored exactly once."""
+    url = CharField(primary_key=True)
+    title = TextField(null=True)
+    description = TextField(null=True)
+    source = CharField(null=True)
+    published_at = DateTimeField(index=True)
+    sentiment = FloatField()
+    is_duplicate = BooleanField(default=False)  # Syndicated copy of a story already counted
+
+
+class TickerArticle(BaseModel):
+    """Links an article to each ticker whose news query returned it."""
+    ticker = CharField()
+    url = CharField()
+    published_at = DateTimeField()
+
+    class Meta:
+        primary_key = CompositeKey('ticker', 'url')
+        indexes = ((('ticker', 'published_at'), False),)
+
+
+class DailySentiment(BaseModel):
+    """Running per-ticker, per-day sentiment totals, updated as articles are ingested."""
+    ticker = CharField()
+    day = DateField()
+    score_sum = FloatField(default=0.0)
+    article_count = IntegerField(default=0)
+
+    class Meta:
+        primary_key = CompositeKey('ticker', 'day')
+
+
+class IngestCursor(BaseModel):
+    """The publication time up to which every article for a ticker has been ingested."""
+    ticker = CharField(primary_key=True)
+    last_published_at = DateTimeField()
+
+
+def init_news_store(path=None):
+    """
+    Opens the news store, creating its tables on first use.
+
+    Args:
+        path (str): SQLite file to use. Defaults to news.db in the app's data directory.
+    """
+    open_database(db, "news.db", [Article, TickerArticle, DailySentiment, IngestCursor], path)
+
+
+def _parse_published_at(value):
+    # Stored as naive UTC so SQLite ordering and day bucketing are consistent
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _to_api_article(article):
+    # Same shape as a NewsAPI article so the UI and analyzer can use either
+    return {
+        'url': article.url,
+        'title': article.title,
+        'description': article.description,
+        'source': {'name': article.source},
+        'publishedAt': article.published_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'sentiment': article.sentiment,
+        'duplicate': article.is_duplicate,
+    }
+
+
+def _format_time(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def _walk_back(ticker, api_key, since, until, budget, stop_at_linked):
+    # Pages newest-first from 'until' (None = now) down to 'since', moving 'to' back to the
+    # oldest article seen. Returns (articles, reached) where reached means nothing was left in between.
+    articles = []
+    while budget[0] > 0:
+        budget[0] -= 1
+        try:
+            page = download_news(ticker, api_key, since=_format_time(since),
+                                 until=until and _format_time(until), page_size=INCREMENTAL_PAGE_SIZE)
+        except requests.exceptions.RequestException as e:
+            st.warning(f"Could not fetch news. Please check your NewsAPI key. Error: {e}")
+            return articles, False
+        articles.extend(page)
+        if len(page) < INCREMENTAL_PAGE_SIZE:
+            return articles, True
+        urls = [a['url'] for a in page if a.get('url')]
+        if stop_at_linked and TickerArticle.select().where(
+                (TickerArticle.ticker == ticker) & (TickerArticle.url.in_(urls))).exists():
+            return articles, True
+        oldest = min((t for t in map(_parse_published_at, (a.get('publishedAt') for a in page)) if t), default=None)
+        if oldest is None or oldest <= since:
+            return articles, True
+        # 'to' is inclusive; step past a page that all shares one timestamp so the walk always moves
+        until = oldest if until is None or oldest < until else oldest - timedelta(seconds=1)
+    return articles, False
+
+
+def _fetch_since(ticker, api_key, since):
+    """
+    Fetches every article published since the cursor, within a request budget.
+
+    NewsAPI returns newest articles first, so older pages are requested by moving
+    'to' back to the oldest article fetched so far. When the budget runs out first,
+    the articles fetched are stored but the cursor stays put: they sit above the
+    cursor as one contiguous block, and the next ingest fills the gap beneath
+    them before looking for newer articles.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        api_key (str): Your personal NewsAPI key.
+        since (datetime): The ticker's cursor (naive UTC).
+
+    Returns:
+        tuple: (articles, advance_to) where advance_to is the new cursor, or None to keep it.
+    """
+    budget = [MAX_INCREMENTAL_REQUESTS]
+    above = (TickerArticle
+             .select(fn.MIN(TickerArticle.published_at), fn.MAX(TickerArticle.published_at))
+             .where((TickerArticle.ticker == ticker) & (TickerArticle.published_at > since))
+             .tuples().first())
+    articles = []
+    if above and above[0] is not None:
+        gap_top, block_top = (_parse_published_at(value) for value in above)
+        articles, closed = _walk_back(ticker, api_key, since, gap_top, budget, stop_at_linked=False)
+        if not closed:
+            return articles, None
+        since = block_top
+
+    newer, reached = _walk_back(ticker, api_key, since, None, budget, stop_at_linked=True)
+    articles += newer
+    if not reached:
+        return articles, since
+    newest = max((t for t in map(_parse_published_at, (a.get('publishedAt') for a in newer)) if t), default=since)
+    return articles, max(newest, since)
+
+
+def _stored_stories(ticker, start, end):
+    # Stories already counted for the ticker around the new articles, in the shape the analyzer expects
+    query = (Article
+             .select(Article.title, Article.description, Article.published_at)
+             .join(TickerArticle, on=(TickerArticle.url == Article.url))
+             .where((TickerArticle.ticker == ticker) & (Article.is_duplicate == False)
+                    & (Article.published_at.between(start - DEDUPE_LOOKBACK, end + DEDUPE_LOOKBACK))))
+    return [{'title': a.title, 'description': a.description,
+             'publishedAt': a.published_at.strftime('%Y-%m-%dT%H:%M:%SZ')} for a in query]
+
+
+def ingest_news(ticker, api_key):
+    """
+    Pulls only the articles published since the last ingest and scores just those.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        api_key (str): Your personal NewsAPI key.
+
+    Returns:
+        int: The number of articles newly linked to the ticker.
+    """
+    init_news_store()
+    cursor = IngestCursor.get_or_none(IngestCursor.ticker == ticker)
+    if cursor is None or not api_key or api_key == "YOUR_API_KEY":
+        fetched = get_news_data(ticker, api_key)
+        advance_to = max(filter(None, map(_parse_published_at, (a.get('publishedAt') for a in fetched))), default=None)
+    else:
+        fetched, advance_to = _fetch_since(ticker, api_key, cursor.last_published_at)
+
+    candidates = {}
+    for article in fetched:
+        published_at = _parse_published_at(article.get('publishedAt'))
+        if article.get('url') and published_at is not None:
+            candidates[article['url']] = (article, published_at)
+
+    # 'from' is inclusive, and other tickers may already have stored the same story
+    urls = list(candidates)
+    linked = {row.url for row in TickerArticle.select(TickerArticle.url).where(
+        (TickerArticle.ticker == ticker) & (TickerArticle.url.in_(urls)))}
+    known = {row.url: row for row in Article.select().where(Article.url.in_(urls))}
+    new_urls = [url for url in urls if url not in linked]
+
+    # Score unseen articles; anything dropped by near-duplicate collapsing (within the batch,
+    # or against stories stored earlier under another URL) is a syndicated copy
+    unseen = [candidates[url][0] for url in new_urls if url not in known]
+    scores, plain_scores = {}, {}
+    if unseen:
+        times = [candidates[a['url']][1] for a in unseen]
+        stored_stories = _stored_stories(ticker, min(times), max(times))
+        scores = {a['url']: score for a, score in score_articles(unseen, known=stored_stories)}
+        plain_scores = {a['url']: score for a, score in score_articles(
+            [a for a in unseen if a['url'] not in scores], dedupe=False)}
+
+    daily, linked_count = {}, 0
+    with db.atomic():
+        for url in new_urls:
+            article, published_at = candidates[url]
+            # The lookups above ran outside this transaction, so a concurrent ingest of the
+            # same story may have stored or linked it since; only a link made here is counted
+            stored = known.get(url)
+            if stored is None:
+                row = dict(url=url,
+                           title=article.get('title'),
+                           description=article.get('description'),
+                           source=(article.get('source') or {}).get('name'),
+                           published_at=published_at,
+                           sentiment=scores.get(url, plain_scores.get(url, 0.0)),
+                           is_duplicate=url not in scores)
+                if Article.insert(**row).on_conflict_ignore().as_rowcount().execute():
+                    stored = Article(**row)
+                else:
+                    stored = Article.get_by_id(url)
+            linked_here = (TickerArticle
+                           .insert(ticker=ticker, url=url, published_at=published_at)
+                           .on_conflict_ignore()
+                           .as_rowcount()
+                           .execute())
+            if not linked_here:
+                continue
+            linked_count += 1
+            if not stored.is_duplicate:
+                total, count = daily.get(published_at.date(), (0.0, 0))
+                daily[published_at.date()] = (total + stored.sentiment, count + 1)
+
+        for day, (total, count) in daily.items():
+            (DailySentiment
+             .insert(ticker=ticker, day=day, score_sum=total, article_count=count)
+             .on_conflict(
+                 conflict_target=[DailySentiment.ticker, DailySentiment.day],
+                 update={
+                     DailySentiment.score_sum: DailySentiment.score_sum + total,
+                     DailySentiment.article_count: DailySentiment.article_count + count,
+                 })
+             .execute())
+
+        # Only moved up to the point every article before it is stored
+        if advance_to is not None and (cursor is None or advance_to > cursor.last_published_at):
+            (IngestCursor
+             .insert(ticker=ticker, last_published_at=advance_to)
+             .on_conflict(
+                 conflict_target=[IngestCursor.ticker],
+                 update={IngestCursor.last_published_at: advance_to},
+                 where=IngestCursor.last_published_at < advance_to)
+             .execute())
+
+    return linked_count
+
+
+def get_recent_articles(ticker, limit=20):
+    """
+    Returns the most recent stored articles for a ticker.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        limit (int): Maximum number of articles to return.
+
+    Returns:
+        list: NewsAPI-shaped article dictionaries (plus 'sentiment' and 'duplicate' keys), newest first.
+    """
+    init_news_store()
+    query = (Article
+             .select(Article)
+             .join(TickerArticle, on=(TickerArticle.url == Article.url))
+             .where(TickerArticle.ticker == ticker)
+             .order_by(TickerArticle.published_at.desc())
+             .limit(limit))
+    return [_to_api_article(article) for article in query]
+
+
+def get_stored_sentiment(articles):
+    """
+    Aggregates the stored per-article sentiment of articles from get_recent_articles.
+
+    Args:
+        articles (list): Articles carrying a 'sentiment' key.
+
+    Returns:
+        float: The recency-weighted average sentiment, without rescoring any text.
+    """
+    kept = [a for a in articles if not a.get('duplicate')]
+    return recency_weighted_mean([a['sentiment'] for a in kept], [a['publishedAt'] for a in kept])
+
+
+def get_daily_sentiment(ticker):
+    """
+    Reads the stored daily sentiment series for a ticker.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+
+    Returns:
+        pd.DataFrame: Indexed by day, with 'sentiment' (daily mean) and 'articles' columns.
+    """
+    init_news_store()
+    rows = list(DailySentiment
+                .select(DailySentiment.day, DailySentiment.score_sum, DailySentiment.article_count)
+                .where((DailySentiment.ticker == ticker) & (DailySentiment.article_count > 0))
+                .order_by(DailySentiment.day)
+                .tuples())
+    frame = pd.DataFrame(rows, columns=['day', 'score_sum', 'articles'])
+    frame['sentiment'] = frame['score_sum'] / frame['articles'].where(frame['articles'] > 0)
+    frame.index = pd.to_datetime(frame.pop('day'))
+    return frame[['sentiment', 'articles']]
+
+
+def get_article_events(ticker):
+    """
+    Reads every stored article for a ticker as an event for the event study.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+
+    Returns:
+        pd.DataFrame: 'published_at' (UTC) and 'sentiment' columns, one row per story
+                      (syndicated duplicates excluded), oldest first.
+    """
+    init_news_store()
+    rows = list(Article
+                .select(TickerArticle.published_at, Article.sentiment)
+                .join(TickerArticle, on=(TickerArticle.url == Article.url))
+                .where((TickerArticle.ticker == ticker) & (Article.is_duplicate == False))
+                .order_by(TickerArticle.published_at)
+                .tuples())
+    frame = pd.DataFrame(rows, columns=['published_at', 'sentiment'])
+    frame['published_at'] = pd.to_datetime(frame['published_at']).dt.tz_localize('UTC')
+    return frame
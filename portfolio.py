@@ -0,0 +1,226 @@
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_fetcher import get_price_history
+
+TRADING_DAYS = 252
+MIN_OBSERVATIONS = 60  # Tickers with fewer daily returns than this are left out of the matrix
+
+
+def build_returns_matrix(prices, min_observations=MIN_OBSERVATIONS):
+    """
+    Aligns closing prices on a shared index and converts them to daily simple returns.
+
+    Args:
+        prices (pd.DataFrame): Closing prices, one column per ticker.
+        min_observations (int): Minimum number of returns a ticker needs to be kept.
+
+    Returns:
+        pd.DataFrame: Daily returns with no missing values, one column per kept ticker.
+    """
+    # Short gaps (holidays on one listing, halted days) are carried forward, not dropped
+    prices = prices.sort_index().ffill(limit=5)
+    returns = prices.pct_change(fill_method=None).iloc[1:]
+    returns = returns.loc[:, returns.notna().sum() >= min_observations]
+    return returns.dropna()
+
+
+def ledoit_wolf_covariance(returns):
+    """
+    Estimates the covariance matrix with Ledoit-Wolf shrinkage towards a scaled identity.
+
+    Shrinkage keeps the matrix well conditioned (and invertible) when the number of
+    holdings approaches the number of observations.
+
+    Args:
+        returns (np.ndarray): A (observations x assets) array of returns.
+
+    Returns:
+        tuple: (covariance, shrinkage) where covariance is (assets x assets) and
+               shrinkage is the weight given to the identity target, between 0 and 1.
+    """
+    n, p = returns.shape
+    X = returns - returns.mean(axis=0)
+    sample_cov = X.T @ X / n
+    mu = np.trace(sample_cov) / p
+
+    X2 = X ** 2
+    # Variance of the sample covariance entries (beta) vs. distance to the target (delta)
+    beta = ((X2.T @ X2).sum() / n - (sample_cov ** 2).sum()) / (p * n)
+    delta = ((sample_cov ** 2).sum() - 2 * mu * np.trace(sample_cov) + p * mu ** 2) / p
+    beta = min(beta, delta)
+    shrinkage = 0.0 if delta == 0 else beta / delta
+
+    covariance = (1 - shrinkage) * sample_cov
+    covariance[np.diag_indices(p)] += shrinkage * mu
+    return covariance, shrinkage
+
+
+def normalize_weights(weights):
+    """Scales weights to sum to one (equal weights if they sum to zero)."""
+    weights = np.asarray(weights, dtype=float)
+    total = weights.sum()
+    if total == 0:
+        return np.full(len(weights), 1.0 / len(weights))
+    return weights / total
+
+
+class PortfolioModel:
+    """
+    Portfolio statistics over an aligned returns matrix.
+
+    Everything that does not depend on the weights (mean returns, shrunk covariance
+    and its inverse, frontier constants) is computed once in the constructor, so
+    re-evaluating after a weight change is a handful of matrix-vector products.
+    """
+
+    def __init__(self, returns):
+        """
+        Args:
+            returns (pd.DataFrame): Daily returns from build_returns_matrix.
+        """
+        self.tickers = list(returns.columns)
+        self.index = returns.index
+        self.returns = returns.to_numpy(dtype=float)
+        self.daily_mean = self.returns.mean(axis=0)
+        self.daily_cov, self.shrinkage = ledoit_wolf_covariance(self.returns)
+
+        self.mean = self.daily_mean * TRADING_DAYS
+        self.cov = self.daily_cov * TRADING_DAYS
+        self.volatility = np.sqrt(np.diag(self.cov))
+
+        # Frontier constants for the closed-form mean-variance solution
+        ones = np.ones(len(self.tickers))
+        self._inv_ones = np.linalg.solve(self.cov, ones)
+        self._inv_mean = np.linalg.solve(self.cov, self.mean)
+        self._A = ones @ self._inv_ones
+        self._B = ones @ self._inv_mean
+        self._C = self.mean @ self._inv_mean
+        self._D = self._A * self._C - self._B ** 2
+
+    def correlation(self):
+        """Returns the shrunk correlation matrix as a DataFrame."""
+        corr = self.cov / np.outer(self.volatility, self.volatility)
+        return pd.DataFrame(corr, index=self.tickers, columns=self.tickers)
+
+    def metrics(self, weights, confidence=0.95, horizon_days=1):
+        """
+        Computes risk and return statistics for a set of weights.
+
+        Args:
+            weights (array-like): Portfolio weights in the order of self.tickers (normalized here).
+            confidence (float): VaR confidence level, e.g. 0.95.
+            horizon_days (int): VaR horizon in trading days (scaled by the square root of time).
+
+        Returns:
+            dict: Annualized 'expected_return' and 'volatility', 'sharpe' (zero risk-free rate),
+                  and 'historical_var', 'parametric_var', 'historical_cvar' as positive
+                  fractions of portfolio value lost over the horizon.
+        """
+        w = normalize_weights(weights)
+        daily_returns = self.returns @ w
+        daily_mean = self.daily_mean @ w
+        daily_vol = np.sqrt(w @ self.daily_cov @ w)
+        scale = np.sqrt(horizon_days)
+
+        cutoff = np.quantile(daily_returns, 1 - confidence)
+        tail = daily_returns[daily_returns <= cutoff]
+        z = NormalDist().inv_cdf(confidence)
+
+        expected_return = daily_mean * TRADING_DAYS
+        volatility = daily_vol * np.sqrt(TRADING_DAYS)
+        return {
+            'expected_return': expected_return,
+            'volatility': volatility,
+            'sharpe': expected_return / volatility if volatility > 0 else np.nan,
+            'historical_var': -cutoff * scale,
+            'historical_cvar': -tail.mean() * scale if tail.size else np.nan,
+            'parametric_var': (z * daily_vol - daily_mean) * scale,
+        }
+
+    def efficient_frontier(self, points=50, return_range=None):
+        """
+        Traces the mean-variance efficient frontier (short sales allowed) in closed form.
+
+        Args:
+            points (int): Number of target returns to evaluate.
+            return_range (tuple): Optional (low, high) annualized target returns; defaults
+                                  to the minimum-variance return up to the best single asset.
+
+        Returns:
+            tuple: (frontier, weights) where frontier is a DataFrame with 'return' and
+                   'volatility' columns and weights is a (points x assets) array.
+        """
+        min_var_return = self._B / self._A
+        if return_range is None:
+            return_range = (min_var_return, max(self.mean.max(), min_var_return))
+        targets = np.linspace(return_range[0], return_range[1], points)
+
+        variances = (self._A * targets ** 2 - 2 * self._B * targets + self._C) / self._D
+        # w(t) = [(C - B t) Σ⁻¹1 + (A t - B) Σ⁻¹μ] / D, for every target at once
+        weights = (np.outer(self._C - self._B * targets, self._inv_ones)
+                   + np.outer(self._A * targets - self._B, self._inv_mean)) / self._D
+        frontier = pd.DataFrame({'return': targets, 'volatility': np.sqrt(np.maximum(variances, 0))})
+        return frontier, weights
+
+    def min_variance_weights(self):
+        """Returns the global minimum-variance weights."""
+        return self._inv_ones / self._A
+
+    def max_sharpe_weights(self):
+        """
+        Returns the tangency (maximum Sharpe ratio, zero risk-free rate) weights.
+
+        Σ⁻¹μ / B is only the tangency portfolio while the minimum-variance portfolio
+        earns more than the risk-free rate (B > 0). Otherwise it lies on the lower,
+        inefficient branch of the frontier, where it minimizes the Sharpe ratio.
+
+        Returns:
+            np.ndarray: The weights, or None when B <= 0 and no tangency portfolio exists.
+        """
+        if self._B <= 0:
+            return None
+        return self._inv_mean / self._B
+
+
+def parse_holdings(text):
+    """
+    Parses holdings entered as one 'TICKER [WEIGHT]' per line (commas also accepted).
+
+    Args:
+        text (str): The raw text from the holdings box.
+
+    Returns:
+        dict: Mapping of upper-cased ticker to weight (1.0 when omitted), in entry order.
+    """
+    holdings = {}
+    for line in text.replace(',', ' ').splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        try:
+            weight = float(parts[1].rstrip('%')) if len(parts) > 1 else 1.0
+        except ValueError:
+            weight = 1.0
+        holdings[parts[0].upper()] = holdings.get(parts[0].upper(), 0.0) + weight
+    return holdings
+
+
+@st.cache_resource(show_spinner="Building portfolio model...", max_entries=8)
+def load_portfolio_model(tickers, period="1y"):
+    """
+    Builds (and caches) the portfolio model for a set of tickers.
+
+    Args:
+        tickers (tuple): The ticker symbols in the portfolio.
+        period (str): The history period to estimate from.
+
+    Returns:
+        PortfolioModel: The model, or None if no ticker had enough history.
+    """
+    returns = build_returns_matrix(get_price_history(tuple(tickers), period))
+    if returns.shape[1] == 0:
+        return None
+    return PortfolioModel(returns)
@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+import streamlit as st
+
+from storage import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# INVESTA_PROFILE=1 profiles every rerun; otherwise '?profile=1' in the URL profiles the next one
+PROFILE_EVERY_RERUN = os.environ.get("INVESTA_PROFILE", "") == "1"
+PROFILE_DIR = os.environ.get("INVESTA_PROFILE_DIR") or os.path.join(DATA_DIR, "profiles")
+SAMPLE_INTERVAL = float(os.environ.get("INVESTA_PROFILE_INTERVAL_MS", "5")) / 1000.0
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+class RerunProfiler:
+    """
+    Samples the script thread's Python stack at a fixed interval for one rerun.
+
+    Sampling runs on its own thread, so the script itself is not instrumented.
+    The rerun is over once the script's module frame leaves the stack, whether
+    it ran to the end or was cut short by st.rerun() or st.stop().
+    """
+
+    def __init__(self, script_frame, name, interval=SAMPLE_INTERVAL):
+        self.script_frame = script_frame
+        self.name = name
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.frames = []
+        self._frame_index = {}
+        self.samples = []
+        self.weights = []
+        self.path = None
+
+    def start(self):
+        threading.Thread(target=self._run, name="rerun-profiler", daemon=True).start()
+
+    def _frame_id(self, code):
+        key = (code.co_qualname, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({'name': key[0], 'file': key[1], 'line': key[2]})
+        return index
+
+    def _sample(self):
+        # Leaf-to-root walk that stops at the script's module frame; None once it is gone
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(self._frame_id(frame.f_code))
+            if frame is self.script_frame:
+                stack.reverse()
+                return stack
+            frame = frame.f_back
+        return None
+
+    def _run(self):
+        started = last = time.perf_counter()
+        while True:
+            time.sleep(self.interval)
+            stack = self._sample()
+            now = time.perf_counter()
+            if stack is None:
+                break
+            self.samples.append(stack)
+            self.weights.append(now - last)
+            last = now
+        self.path = self.save(last - started)
+
+    def save(self, duration):
+        """
+        Writes the samples as a speedscope 'sampled' profile.
+
+        Args:
+            duration (float): Wall-clock seconds covered by the samples.
+
+        Returns:
+            str: Path of the written file.
+        """
+        profile = {
+            '$schema': SPEEDSCOPE_SCHEMA,
+            'name': self.name,
+            'exporter': 'investa-profiler',
+            'shared': {'frames': self.frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': self.name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': duration,
+                'samples': self.samples,
+                'weights': self.weights,
+            }],
+        }
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = profile_path(self.name)
+        with open(path, 'w') as f:
+            json.dump(profile, f)
+        # Saved from the sampling thread after the rerun ends, so there is no page left to notify
+        logger.info("Saved rerun profile (%.2fs, %d samples) to %s", duration, len(self.samples), path)
+        return path
+
+
+def profile_path(name):
+    """Returns where the profile with this name is saved."""
+    return os.path.join(PROFILE_DIR, f"{name}.speedscope.json")
+
+
+def _slug(value):
+    return re.sub(r"[^A-Za-z0-9_-]+", "-", str(value or "")).strip('-') or "none"
+
+
+def start_rerun_profiler(ticker, page):
+    """
+    Starts sampling the current rerun if profiling is switched on; otherwise does nothing.
+
+    Call it from the top level of main_app.py. The profile is saved to PROFILE_DIR
+    as '<timestamp>_<ticker>_<page>.speedscope.json' when the rerun ends, and
+    opens in speedscope.app or any flamegraph viewer that reads that format.
+
+    Args:
+        ticker (str): The ticker in view, used in the file name.
+        page (str): The view or page being rendered, used in the file name.
+
+    Returns:
+        RerunProfiler: The running profiler, or None when profiling is off.
+    """
+    if not PROFILE_EVERY_RERUN:
+        if st.query_params.get("profile") != "1":
+            return None
+        # One-shot: later reruns are not profiled unless the parameter is added again
+        del st.query_params["profile"]
+
+    name = f"{datetime.now():%Y%m%d-%H%M%S-%f}_{_slug(ticker)}_{_slug(page)}"
+    profiler = RerunProfiler(sys._getframe(1), name)
+    profiler.start()
+    if not PROFILE_EVERY_RERUN:
+        st.toast(f"Profiling this rerun; it will be saved to {profile_path(name)}")
+    return profiler
@@ -0,0 +1,100 @@
+import numpy as np
+
+SIMULATED_PATHS = 100_000
+HORIZON_DAYS = 63  # About one quarter of trading days
+CHUNK_PATHS = 10_000  # Paths generated per chunk; bounds memory to CHUNK_PATHS x HORIZON_DAYS floats
+BLOCK_SIZE = 5  # Days per bootstrap block, preserving short-term autocorrelation
+LOOKBACK_DAYS = 252  # Returns used to calibrate the simulation
+SEVERE_LOSS = 0.10
+
+# Largest risk each tolerance level accepts for a buy signal over the simulated horizon
+RISK_LIMITS = {
+    "Low": {'drawdown_95': 0.15, 'severe_loss_probability': 0.10},
+    "Medium": {'drawdown_95': 0.25, 'severe_loss_probability': 0.20},
+    "High": {'drawdown_95': 0.40, 'severe_loss_probability': 0.35},
+}
+
+
+def _gbm_chunk(rng, log_returns, n_paths, horizon):
+    mu, sigma = log_returns.mean(), log_returns.std(ddof=1)
+    return mu + sigma * rng.standard_normal(size=(n_paths, horizon), dtype=np.float32)
+
+
+def _bootstrap_chunk(rng, log_returns, n_paths, horizon, block_size):
+    # Circular block bootstrap: stitch random blocks of consecutive historical days
+    n_blocks = -(-horizon // block_size)
+    starts = rng.integers(0, len(log_returns), size=(n_paths, n_blocks, 1))
+    idx = (starts + np.arange(block_size)) % len(log_returns)
+    return log_returns[idx.reshape(n_paths, -1)[:, :horizon]]
+
+
+def simulate_risk(close, method="bootstrap", n_paths=SIMULATED_PATHS, horizon_days=HORIZON_DAYS,
+                  block_size=BLOCK_SIZE, chunk_paths=CHUNK_PATHS, seed=None):
+    """
+    Simulates forward price paths and summarizes their loss and drawdown distributions.
+
+    Args:
+        close (pd.Series): Historical closing prices (e.g. hist_with_indicators['Close']).
+        method (str): "bootstrap" (block-bootstrapped historical returns) or "gbm" (geometric Brownian motion).
+        n_paths (int): Number of simulated paths.
+        horizon_days (int): Trading days simulated per path.
+        block_size (int): Consecutive days per bootstrap block.
+        chunk_paths (int): Paths generated at once, which bounds peak memory.
+        seed (int): Optional random seed for reproducible results.
+
+    Returns:
+        dict: Summary statistics ('loss_probability', 'severe_loss_probability', 'expected_return',
+              'var_95', 'cvar_95', 'median_drawdown', 'drawdown_95') plus the 'final_returns' and
+              'max_drawdowns' arrays, or None if there is not enough history.
+    """
+    log_returns = np.log(close.astype(float)).diff().dropna().tail(LOOKBACK_DAYS).to_numpy(dtype=np.float32)
+    if len(log_returns) < max(20, block_size):
+        return None
+
+    rng = np.random.default_rng(seed)
+    final_returns = np.empty(n_paths, dtype=np.float32)
+    max_drawdowns = np.empty(n_paths, dtype=np.float32)
+    for start in range(0, n_paths, chunk_paths):
+        size = min(chunk_paths, n_paths - start)
+        if method == "gbm":
+            steps = _gbm_chunk(rng, log_returns, size, horizon_days)
+        else:
+            steps = _bootstrap_chunk(rng, log_returns, size, horizon_days, block_size)
+
+        log_paths = np.cumsum(steps, axis=1)
+        # The running peak includes the starting price (log value 0)
+        peaks = np.maximum.accumulate(np.maximum(log_paths, 0), axis=1)
+        max_drawdowns[start:start + size] = 1 - np.exp((log_paths - peaks).min(axis=1))
+        final_returns[start:start + size] = np.expm1(log_paths[:, -1])
+
+    var_cutoff = np.quantile(final_returns, 0.05)
+    return {
+        'method': method,
+        'horizon_days': horizon_days,
+        'n_paths': n_paths,
+        'loss_probability': float((final_returns < 0).mean()),
+        'severe_loss_probability': float((final_returns < -SEVERE_LOSS).mean()),
+        'expected_return': float(final_returns.mean()),
+        'var_95': float(-var_cutoff),
+        'cvar_95': float(-final_returns[final_returns <= var_cutoff].mean()),
+        'median_drawdown': float(np.median(max_drawdowns)),
+        'drawdown_95': float(np.quantile(max_drawdowns, 0.95)),
+        'final_returns': final_returns,
+        'max_drawdowns': max_drawdowns,
+    }
+
+
+def exceeds_tolerance(risk_profile, risk_tolerance):
+    """
+    Checks a simulated risk profile against the limits for a risk tolerance level.
+
+    Args:
+        risk_profile (dict): Output of simulate_risk.
+        risk_tolerance (str): 'Low', 'Medium' or 'High'.
+
+    Returns:
+        bool: True if the simulated drawdown or chance of a severe loss is above the level's limits.
+    """
+    limits = RISK_LIMITS.get(risk_tolerance, RISK_LIMITS["Medium"])
+    return (risk_profile['drawdown_95'] > limits['drawdown_95']
+            or risk_profile['severe_loss_probability'] > limits['severe_loss_probability'])
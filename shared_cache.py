@@ -0,0 +1,231 @@
+import functools
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+import pandas as pd
+
+from storage import data_path
+
+# One SQLite file per host; every Streamlit server process on the machine shares it
+CACHE_PATH = os.environ.get("SHARED_CACHE_PATH") or data_path("shared_cache.db")
+MAX_BYTES = int(float(os.environ.get("SHARED_CACHE_MAX_MB", "512")) * 1024 * 1024)
+LEASE_SECONDS = 120  # How long one process may hold the right to compute a missing key
+POLL_SECONDS = 0.1
+TOUCH_INTERVAL = 60  # Hits refresh an entry's LRU timestamp at most this often
+
+
+class SharedCache:
+    """
+    A disk-backed key-value cache shared by processes on one host.
+
+    Entries have a TTL and are evicted least-recently-used first once the total
+    payload passes max_bytes. A per-key lease stops a stampede: when a key is
+    missing, one process computes it while the others wait for its result.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.owner = uuid.uuid4().hex
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,
+                expires_at REAL NOT NULL, accessed_at REAL NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+            conn.execute("""CREATE TABLE IF NOT EXISTS leases (
+                key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)""")
+
+    def _connect(self):
+        # One connection per thread and process; SQLite's file locks coordinate between them
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        """
+        Looks up a key.
+
+        Returns:
+            tuple: (hit, value); value is None on a miss.
+        """
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, accessed_at FROM entries WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return False, None
+        if now - row[1] > TOUCH_INTERVAL:
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return True, pickle.loads(row[0])
+
+    def set(self, key, value, ttl):
+        """Stores a value for ttl seconds, then evicts entries if the cache is over its size limit."""
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, sqlite3.Binary(payload), len(payload), now + ttl, now)
+        )
+        self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            # Drop least recently used entries until the cache fits with some headroom
+            target = self.max_bytes * 0.9
+            for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+                if total <= target:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def acquire_lease(self, key, seconds=LEASE_SECONDS):
+        """
+        Takes the host-wide lease on key unless another holder's lease is still live.
+
+        Leases expire on their own, so one left behind by a crashed process
+        lapses after at most 'seconds'.
+
+        Args:
+            key (str): Names the work the lease guards.
+            seconds (float): How long the lease lasts unless renewed or released.
+
+        Returns:
+            bool: True if this process now holds the lease.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires_at <= ?", (key, now))
+            acquired = conn.execute(
+                "INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, self.owner, now + seconds)
+            ).rowcount == 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return acquired
+
+    def renew_lease(self, key, seconds=LEASE_SECONDS):
+        """Extends a lease this process holds; returns False if it has already lapsed or changed hands."""
+        return self._connect().execute(
+            "UPDATE leases SET expires_at = ? WHERE key = ? AND owner = ?", (time.time() + seconds, key, self.owner)
+        ).rowcount == 1
+
+    def release_lease(self, key):
+        """Gives up a lease this process holds."""
+        self._connect().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+    def get_or_compute(self, key, compute, ttl, should_cache=None):
+        """
+        Returns the cached value for key, computing it at most once across processes on a miss.
+
+        Args:
+            key (str): The cache key.
+            compute (callable): Produces the value when it is missing.
+            ttl (float): Seconds the computed value stays valid.
+            should_cache (callable): Optional predicate; results it rejects (e.g. errors) are returned but not stored.
+
+        Returns:
+            The cached or freshly computed value.
+        """
+        deadline = time.time() + LEASE_SECONDS
+        while True:
+            hit, value = self.get(key)
+            if hit:
+                return value
+            if self.acquire_lease(key):
+                try:
+                    value = compute()
+                    if should_cache is None or should_cache(value):
+                        self.set(key, value, ttl)
+                    return value
+                finally:
+                    self.release_lease(key)
+            if time.time() > deadline:
+                # The holder is stuck; compute locally rather than block the page forever
+                return compute()
+            time.sleep(POLL_SECONDS)
+
+
+def _digest_arg(arg, h):
+    if isinstance(arg, (pd.DataFrame, pd.Series)):
+        h.update(type(arg).__name__.encode())
+        if isinstance(arg, pd.DataFrame):
+            h.update(repr(list(arg.columns)).encode())
+        h.update(pd.util.hash_pandas_object(arg, index=True).to_numpy().tobytes())
+    else:
+        h.update(pickle.dumps(arg, protocol=4))
+
+
+def make_key(namespace, args, kwargs):
+    """Builds a cache key from a function's namespace and call arguments."""
+    h = hashlib.sha256(namespace.encode())
+    for arg in args:
+        _digest_arg(arg, h)
+    for name in sorted(kwargs):
+        h.update(name.encode())
+        _digest_arg(kwargs[name], h)
+    return f"{namespace}:{h.hexdigest()}"
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """Returns this process's handle on the host-wide cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SharedCache()
+        return _cache
+
+
+def shared_cache(ttl, should_cache=None):
+    """
+    Decorator that caches a function's results in the cross-process cache.
+
+    Stack it under @st.cache_data so each process still keeps its own in-memory
+    copy and only falls through to the shared cache on a local miss.
+
+    Args:
+        ttl (float): Seconds a result stays valid.
+        should_cache (callable): Optional predicate deciding whether a result is stored.
+    """
+    def decorator(func):
+        namespace = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(namespace, args, kwargs)
+            return get_shared_cache().get_or_compute(
+                key, lambda: func(*args, **kwargs), ttl, should_cache
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,259 @@
+import os
+import threading
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_fetcher import get_price_history, download_price_history
+from storage import data_path
+
+SIMILARITY_WINDOW = 126  # Rolling window of daily returns (about six months)
+BLOCK_SIZE = 128  # Columns per block when building the cross-product matrix
+INDEX_FILE = "similarity_index.npz"
+
+
+def _naive_dates(prices):
+    # Dates are compared against the stored last date, which is kept timezone-naive
+    if getattr(prices.index, 'tz', None) is not None:
+        prices = prices.tz_localize(None)
+    return prices
+
+
+def _completed_sessions(prices):
+    # A still-moving intraday bar would be recorded as the day's close and never replaced
+    today = datetime.now(timezone.utc).date()
+    return prices[prices.index.date < today]
+
+
+class CorrelationIndex:
+    """
+    Rolling-window return correlations across a fixed universe of symbols.
+
+    The index keeps the last `window` daily returns in a float32 ring buffer and
+    running sums (sum, sum of squares and the symbol x symbol cross-product
+    matrix). A new bar adds its outer product and subtracts the one leaving the
+    window, so updates cost O(N^2) instead of a full O(W N^2) rebuild, and a
+    neighbour query reads one row of the matrix in O(N).
+    """
+
+    def __init__(self, symbols, window=SIMILARITY_WINDOW):
+        self.symbols = list(symbols)
+        self.window = window
+        self._position = {symbol: i for i, symbol in enumerate(self.symbols)}
+        n = len(self.symbols)
+        self.buffer = np.zeros((window, n), dtype=np.float32)
+        self.head = 0  # Ring position the next bar overwrites
+        self.count = 0  # Bars currently in the window
+        self.last_prices = np.full(n, np.nan)
+        self.last_date = None
+        # Running sums are float64 so thousands of add/subtract updates do not drift
+        self.sums = np.zeros(n)
+        self.sumsq = np.zeros(n)
+        self.cross = np.zeros((n, n))
+        self.updates_since_rebuild = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_prices(cls, prices, window=SIMILARITY_WINDOW):
+        """
+        Builds the index from a price matrix.
+
+        Args:
+            prices (pd.DataFrame): Closing prices, one column per symbol.
+            window (int): Number of daily returns in the rolling window.
+
+        Returns:
+            CorrelationIndex: The populated index.
+        """
+        prices = _naive_dates(prices).sort_index().ffill()
+        index = cls(prices.columns, window)
+        returns = prices.pct_change(fill_method=None).iloc[1:].tail(window)
+        n_bars = len(returns)
+        index.buffer[:n_bars] = np.nan_to_num(returns.to_numpy(dtype=np.float32))
+        index.count = n_bars
+        index.head = n_bars % window
+        index.last_prices = prices.iloc[-1].to_numpy(dtype=float)
+        index.last_date = prices.index[-1]
+        index._rebuild()
+        return index
+
+    def _window_returns(self):
+        # Rows of the ring buffer that hold data (order does not matter for the sums)
+        return self.buffer if self.count == self.window else self.buffer[:self.count]
+
+    def _rebuild(self):
+        """Recomputes the running sums exactly from the buffer, one column block at a time."""
+        X = self._window_returns()
+        self.sums = X.sum(axis=0, dtype=np.float64)
+        self.sumsq = np.einsum('ij,ij->j', X, X, dtype=np.float64)
+        for start in range(0, X.shape[1], BLOCK_SIZE):
+            block = X[:, start:start + BLOCK_SIZE]
+            self.cross[:, start:start + BLOCK_SIZE] = X.T @ block
+        self.updates_since_rebuild = 0
+
+    def add_bar(self, prices, date=None):
+        """
+        Adds one day's closing prices and slides the window forward.
+
+        Args:
+            prices (np.ndarray): Closing prices in the order of self.symbols (NaN if missing).
+            date: Timestamp of the bar, stored as the index's last date.
+        """
+        prices = np.asarray(prices, dtype=float)
+        returns = np.nan_to_num(prices / self.last_prices - 1).astype(np.float32)
+        self.last_prices = np.where(np.isnan(prices), self.last_prices, prices)
+
+        new = returns.astype(np.float64)
+        if self.count == self.window:
+            old = self.buffer[self.head].astype(np.float64)
+            self.sums += new - old
+            self.sumsq += new * new - old * old
+            self.cross += np.outer(new, new) - np.outer(old, old)
+        else:
+            self.sums += new
+            self.sumsq += new * new
+            self.cross += np.outer(new, new)
+            self.count += 1
+        self.buffer[self.head] = returns
+        self.head = (self.head + 1) % self.window
+        self.last_date = date if date is not None else self.last_date
+
+        self.updates_since_rebuild += 1
+        if self.updates_since_rebuild >= self.window:
+            self._rebuild()
+
+    def update(self, prices):
+        """
+        Applies only the bars newer than the index's last date.
+
+        Args:
+            prices (pd.DataFrame): Recent closing prices (any subset of the universe's columns).
+
+        Returns:
+            int: The number of new bars applied.
+        """
+        aligned = _naive_dates(prices).sort_index().reindex(columns=self.symbols)
+        applied = 0
+        with self.lock:
+            # Checked under the lock so concurrent refreshes cannot apply the same bar twice
+            for date, row in zip(aligned.index, aligned.to_numpy(dtype=float)):
+                if self.last_date is None or date > self.last_date:
+                    self.add_bar(row, date)
+                    applied += 1
+        return applied
+
+    def correlations(self, symbol):
+        """
+        Returns the correlation of one symbol with every symbol in the universe.
+
+        Args:
+            symbol (str): A symbol in the index.
+
+        Returns:
+            pd.Series: Correlations indexed by symbol (NaN for symbols with no variance).
+        """
+        i = self._position[symbol]
+        n = max(self.count, 1)
+        with self.lock:
+            cov = self.cross[i] / n - self.sums[i] * self.sums / n ** 2
+            var = self.sumsq / n - (self.sums / n) ** 2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = cov / np.sqrt(var[i] * var)
+        return pd.Series(corr, index=self.symbols)
+
+    def most_similar(self, symbol, k=10):
+        """
+        Finds the symbols whose returns moved most like the given symbol.
+
+        Args:
+            symbol (str): A symbol in the index.
+            k (int): Number of neighbours to return.
+
+        Returns:
+            pd.Series: The top-k correlations, highest first (empty if the symbol is unknown).
+        """
+        if symbol not in self._position:
+            return pd.Series(dtype=float)
+        corr = self.correlations(symbol).drop(symbol).dropna()
+        return corr.nlargest(k)
+
+    def save(self, path=None):
+        """Writes the index to an .npz file in the app's data directory."""
+        path = path or data_path(INDEX_FILE)
+        tmp_path = path + ".tmp.npz"
+        with self.lock:
+            np.savez(
+                tmp_path,
+                symbols=np.array(self.symbols), window=self.window, buffer=self.buffer,
+                head=self.head, count=self.count, last_prices=self.last_prices,
+                last_date=np.array(str(self.last_date))
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=None):
+        """Reads an index saved with save(), or returns None if there is none."""
+        path = path or data_path(INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            index = cls(data['symbols'].tolist(), int(data['window']))
+            index.buffer[:] = data['buffer']
+            index.head = int(data['head'])
+            index.count = int(data['count'])
+            index.last_prices = data['last_prices']
+            index.last_date = pd.Timestamp(str(data['last_date']))
+        # Only the return window is stored; the running sums are recomputed from it
+        index._rebuild()
+        return index
+
+
+@st.cache_resource
+def get_similarity_index():
+    """Returns the process-wide similarity index, loaded from disk once (None if not built yet)."""
+    return {'index': CorrelationIndex.load()}
+
+
+def build_similarity_index(symbols):
+    """
+    Builds the index over a universe of symbols with one batched price download, and saves it.
+
+    Args:
+        symbols (list): The universe, e.g. every symbol from discover_stocks_yfinance.
+
+    Returns:
+        CorrelationIndex: The new index, or None if no prices could be fetched.
+    """
+    prices = _completed_sessions(get_price_history(tuple(symbols), "1y"))
+    if prices.empty:
+        return None
+    index = CorrelationIndex.from_prices(prices)
+    index.save()
+    get_similarity_index()['index'] = index
+    return index
+
+
+def refresh_similarity_index(index):
+    """
+    Pulls the last month of prices and applies only the bars the index has not seen.
+
+    Args:
+        index (CorrelationIndex): The index to update in place.
+
+    Returns:
+        int: The number of new bars applied.
+    """
+    # Straight from Yahoo: a cached frame from earlier in the session would hold no new bars
+    try:
+        prices = download_price_history(tuple(index.symbols), "1mo")
+    except Exception as e:
+        st.error(f"Error fetching price history: {e}")
+        return 0
+    prices = _completed_sessions(prices)
+    if prices.empty:
+        return 0
+    applied = index.update(prices.ffill())
+    if applied:
+        index.save()
+    return applied
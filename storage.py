@@ -0,0 +1,47 @@
+import os
+import threading
+
+# Local directory for the app's persistent stores (SQLite databases, snapshots, indexes)
+DATA_DIR = os.environ.get(
+    "INVESTA_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".investa_data")
+)
+
+
+def data_path(*parts):
+    """
+    Builds a path inside the app's data directory, creating the directory if needed.
+
+    Args:
+        *parts (str): Path components relative to DATA_DIR.
+
+    Returns:
+        str: The absolute path.
+    """
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+# SQLite settings shared by every store: WAL lets readers run alongside the background writers
+SQLITE_PRAGMAS = {'journal_mode': 'wal', 'synchronous': 'normal', 'busy_timeout': 30000}
+_open_lock = threading.Lock()
+
+
+def open_database(db, filename, models, path=None):
+    """
+    Opens a deferred peewee database on first use and creates its tables.
+
+    Stores call this before every query. The first call, from whichever thread,
+    finishes creating the tables before any other thread gets to use the database.
+
+    Args:
+        db (peewee.SqliteDatabase): A database declared as SqliteDatabase(None).
+        filename (str): The SQLite file's name inside the data directory.
+        models (list): The models whose tables live in this database.
+        path (str): SQLite file to use instead; passing one reopens the database there.
+    """
+    with _open_lock:
+        if db.database is None or path is not None:
+            db.init(path or data_path(filename), pragmas=SQLITE_PRAGMAS)
+            db.create_tables(models, safe=True)
@@ -0,0 +1,48 @@
+import threading
+
+import news_store
+from news_store import Article, DailySentiment, TickerArticle, ingest_news, init_news_store
+
+
+def make_articles(count):
+    return [{'url': f"https://example.com/{i}", 'title': f"Story {i}", 'description': f"Details of story {i}",
+             'source': {'name': "Example"}, 'publishedAt': f"2024-05-{1 + i % 3:02d}T12:{i:02d}:00Z"}
+            for i in range(count)]
+
+
+def test_interleaved_ingests_link_and_count_each_article_once(tmp_path, monkeypatch):
+    init_news_store(str(tmp_path / "news.db"))
+    articles = make_articles(12)
+    monkeypatch.setattr(news_store, 'get_news_data', lambda ticker, api_key: articles)
+
+    # Both ingests finish their lookups before either one writes
+    both_looked_up = threading.Barrier(2, timeout=10)
+    stored_stories = news_store._stored_stories
+
+    def interleaved(*args):
+        both_looked_up.wait()
+        return stored_stories(*args)
+
+    monkeypatch.setattr(news_store, '_stored_stories', interleaved)
+
+    linked, errors = [], []
+
+    def run():
+        try:
+            linked.append(ingest_news('AAPL', None))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(linked) == [0, len(articles)]
+    assert Article.select().count() == len(articles)
+    assert TickerArticle.select().where(TickerArticle.ticker == 'AAPL').count() == len(articles)
+    counted = sum(row.article_count for row in DailySentiment.select().where(DailySentiment.ticker == 'AAPL'))
+    kept = Article.select().where(Article.is_duplicate == False).count()
+    assert counted == kept
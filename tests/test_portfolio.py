@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from portfolio import PortfolioModel
+
+
+def make_returns(drifts, seed=0, days=500):
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0, 0.01, (days, len(drifts)))
+    return pd.DataFrame(noise + np.asarray(drifts), columns=[f"T{i}" for i in range(len(drifts))])
+
+
+def test_max_sharpe_beats_frontier_when_min_variance_return_is_positive():
+    model = PortfolioModel(make_returns([0.001, 0.0005, 0.0008]))
+    weights = model.max_sharpe_weights()
+    assert weights is not None
+    assert np.isclose(weights.sum(), 1.0)
+    best = model.metrics(weights)['sharpe']
+    _, frontier_weights = model.efficient_frontier(points=200)
+    assert all(model.metrics(w)['sharpe'] <= best + 1e-9 for w in frontier_weights)
+
+
+def test_max_sharpe_is_none_when_every_expected_return_is_negative():
+    returns = make_returns([-0.003, -0.002, -0.0025])
+    assert (returns.mean() < 0).all()
+    model = PortfolioModel(returns)
+    assert model.max_sharpe_weights() is None